@@ -1,12 +1,12 @@
 import os
 import json
+import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from results_store import ResultsStore, DEFAULT_DB
 
-def main():
-    # Load results
-    results_dir = 'results'
+def load_json_results(results_dir='results'):
     all_benchmarks = []
 
     for filename in os.listdir(results_dir):
@@ -16,17 +16,20 @@ def main():
                 if 'benchmarks' in data:
                     all_benchmarks.extend(data['benchmarks'])
 
-    df = pd.DataFrame(all_benchmarks)
-    
-    # Create figures directory
-    os.makedirs('figures', exist_ok=True)
-    
-    # Generate dynamic color palette
-    unique_methods = df['method'].unique()
-    colors = plt.cm.tab20(range(len(unique_methods)))
-    color_map = dict(zip(unique_methods, colors))
-    
-    # Plot 1: Execution Time
+    return pd.DataFrame(all_benchmarks)
+
+def load_store_results(db_path, **filters):
+    # Only the filtered rows are read; the WHERE clause uses the store's indexes
+    with ResultsStore(db_path) as store:
+        sql, params = store.query_sql(**filters)
+        return pd.read_sql_query(sql, store.conn, params=params)
+
+def plot_scenario(df, color_map, suffix='', title=''):
+    # Both charts for one scenario; suffix and title tell the files/plots apart.
+    # Runs differ in step count (adaptive runs pick their own), so compare time per step
+    df = df.copy()
+    df['time'] = df['time'] / df['steps']
+
     # Plot 1: Execution Time
     avg_time = df.groupby('method')['time'].mean().sort_values()
     plt.figure(figsize=(12, 8))
@@ -37,20 +40,21 @@ def main():
     # Add labels on bars
     for i, container in enumerate(ax.containers):
         method_name = avg_time.index[i]
-        ax.bar_label(container, labels=[f'{method_name}\n{v:.3f}' for v in container.datavalues], rotation=0, fontsize=6, padding=3)
+        ax.bar_label(container, labels=[f'{method_name}\n{v:.3g}' for v in container.datavalues], rotation=0, fontsize=6, padding=3)
     
-    plt.title('Execution Time per Method by N')
-    plt.xlabel('Time (s)')
+    plt.title(f'Time per Step per Method by N{title}')
+    plt.xlabel('Time per step (s)')
     plt.ylabel('N', rotation=0, labelpad=15)
     plt.xscale('log')
     plt.xlim(left=ax.get_xlim()[0], right=ax.get_xlim()[1] * 3)
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
-    plt.savefig('figures/execution_time.png', dpi=300, bbox_inches='tight')
+    plt.savefig(f'figures/execution_time{suffix}.png', dpi=300, bbox_inches='tight')
     plt.close()
 
     # Plot 2: Speedup Factor
-    baseline = df[df['method'] == 'Vanilla Python'].set_index('n')['time']
+    # Repeated samples (several runs in the store) are averaged per N
+    baseline = df[df['method'] == 'Vanilla Python'].groupby('n')['time'].mean()
     df['speedup'] = df.apply(lambda row: baseline[row['n']] / row['time'] if row['n'] in baseline else None, axis=1)
     
     avg_speedup = df.groupby('method')['speedup'].mean().sort_values()
@@ -64,16 +68,73 @@ def main():
         method_name = avg_speedup.index[i]
         ax.bar_label(container, labels=[f'{method_name}\n{v:.2f}x' for v in container.datavalues], rotation=0, fontsize=6, padding=3)
     
-    plt.title('Speedup Factor vs Vanilla Python')
+    plt.title(f'Speedup Factor vs Vanilla Python{title}')
     plt.xlabel('Speedup (x)')
     plt.ylabel('N', rotation=0, labelpad=15)
     plt.xscale('log')
     plt.xlim(left=ax.get_xlim()[0], right=ax.get_xlim()[1] * 3)
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
-    plt.savefig('figures/speedup_factor.png', dpi=300, bbox_inches='tight')
+    plt.savefig(f'figures/speedup_factor{suffix}.png', dpi=300, bbox_inches='tight')
     plt.close()
 
+def main():
+    parser = argparse.ArgumentParser(description="Plot N-body benchmark results")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite results store (falls back to results/*.json if missing)")
+    parser.add_argument("--method", nargs="+", default=None, help="Only these methods")
+    parser.add_argument("--n", type=int, nargs="+", default=None, help="Only these N values")
+    parser.add_argument("--processor", default=None, help="Only samples from this CPU model")
+    parser.add_argument("--fingerprint", default=None, help="Only samples from this system fingerprint")
+    parser.add_argument("--commit", default=None, help="Only samples from this git commit")
+    parser.add_argument("--since", default=None, help="Only samples recorded at or after this ISO timestamp")
+    parser.add_argument("--scenario", nargs="+", default=None, help="Only these scenarios (each gets its own charts)")
+    args = parser.parse_args()
+
+    # Load results
+    if os.path.exists(args.db):
+        df = load_store_results(
+            args.db, method=args.method, n=args.n, processor=args.processor,
+            fingerprint=args.fingerprint, git_commit=args.commit, since=args.since, scenario=args.scenario
+        )
+    else:
+        df = load_json_results('results')
+        if not df.empty:
+            # Results written before scenarios existed are all uniform
+            df['scenario'] = df['scenario'].fillna('uniform') if 'scenario' in df else 'uniform'
+        if args.scenario:
+            df = df[df['scenario'].isin(args.scenario)]
+        if args.method:
+            df = df[df['method'].isin(args.method)]
+        if args.n:
+            df = df[df['n'].isin(args.n)]
+
+    if df.empty:
+        print("No results match the given filters.")
+        return
+    
+    # Create figures directory
+    os.makedirs('figures', exist_ok=True)
+    
+    # Generate dynamic color palette
+    unique_methods = df['method'].unique()
+    colors = plt.cm.tab20(range(len(unique_methods)))
+    color_map = dict(zip(unique_methods, colors))
+
+    # One set of charts per scenario; the uniform one keeps the original file names
+    scenario_names = sorted(df['scenario'].unique(), key=lambda s: (s != 'uniform', s))
+    for scenario in scenario_names:
+        subset = df[df['scenario'] == scenario]
+        if scenario == 'uniform':
+            plot_scenario(subset, color_map, title='' if len(scenario_names) == 1 else ' (uniform)')
+        else:
+            plot_scenario(subset, color_map, suffix=f'_{scenario}', title=f' ({scenario})')
+
+    if len(scenario_names) > 1:
+        # Mean time per step for each method and N, side by side for every scenario
+        df = df.assign(time_per_step=df['time'] / df['steps'])
+        table = df.pivot_table(index=['method', 'n'], columns='scenario', values='time_per_step', aggfunc='mean')
+        print(table[scenario_names].to_string(float_format=lambda v: f'{v:.3e}'))
+
     print("Analysis complete. Figures saved to 'figures/' directory.")
 
 if __name__ == "__main__":
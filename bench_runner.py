@@ -1,97 +1,263 @@
 import subprocess
 import json
-import platform
 import os
 import sys
 import argparse
-import shutil
+import asyncio
+import time
+from results_store import ResultsStore, DEFAULT_DB, get_git_commit
+from system_info import get_system_info
 
-def get_gpu_info():
-    try:
-        # Check if nvidia-smi exists
-        if not shutil.which("nvidia-smi"):
-             return "No GPU detected (nvidia-smi not found)"
-        
-        result = subprocess.run(["nvidia-smi", "--query-gpu=name,memory.total", 
-                               "--format=csv,noheader"], capture_output=True, text=True)
-        return result.stdout.strip()
-    except Exception as e:
-        return f"GPU Check Failed: {str(e)}"
-
-def get_cuda_version():
-    try:
-        # Check if nvcc exists
-        if not shutil.which("nvcc"):
-            return "Unknown (nvcc not found)"
-
-        result = subprocess.run(["nvcc", "--version"], capture_output=True, text=True)
-        for line in result.stdout.splitlines():
-            if "release" in line:
-                return line.strip()
-        return "Unknown"
-    except:
-        return "Unknown"
-
-def get_system_info():
-    processor = platform.processor()
-    if not processor:
+# src/python holds build_variants and adaptive, imported only for Python runs
+# (the native-only Docker images do not ship it)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "src", "python"))
+
+class CostModel:
+    """Per-method O(N^2 * steps) cost model: time ~= c * N^2 * steps.
+
+    The coefficient c is the median of time / (N^2 * steps) over the samples
+    for a method. Samples measured in the current session take precedence
+    over stored ones. A run that hits its timeout only gives a lower bound
+    on c; run_schedule skips the larger N for that method whose prediction
+    then exceeds --budget or --timeout.
+    """
+
+    def __init__(self):
+        self.stored = {}
+        self.session = {}
+        self.lower_bounds = {}
+
+    def observe(self, method, n, steps, time_taken, stored=False):
+        samples = self.stored if stored else self.session
+        samples.setdefault(method, []).append(time_taken / (n * n * steps))
+
+    def observe_timeout(self, method, n, steps, timeout):
+        c = timeout / (n * n * steps)
+        self.lower_bounds[method] = max(self.lower_bounds.get(method, 0.0), c)
+
+    def predict(self, method, n, steps):
+        coeffs = sorted(self.session.get(method) or self.stored.get(method) or [])
+        c = coeffs[len(coeffs) // 2] if coeffs else None
+        bound = self.lower_bounds.get(method)
+        if bound is not None:
+            c = bound if c is None else max(c, bound)
+        if c is None:
+            return None
+        return c * n * n * steps
+
+# Implementation types whose commands accept --scenario (the native binaries
+# only generate the uniform workload)
+SCENARIO_TYPES = {"python"}
+
+# Implementation types whose commands accept --adaptive (see src/python/adaptive.py);
+# the others run a fixed --steps and are normalized to time per step afterwards
+ADAPTIVE_TYPES = {"python"}
+
+# Per-run wall-clock budget and CI target in adaptive mode when not given
+DEFAULT_ADAPTIVE_BUDGET = 10.0
+DEFAULT_CI_TARGET = 0.02
+
+def variant_implementations():
+    # One method per compiler-flag variant, e.g. "Cython (O3-native)". Imported
+    # here because the native-only Docker images do not ship src/python
+    import build_variants
+    return [
+        (["python", f"src/python/{backend}_runner.py", "--variant", variant], build_variants.method_name(backend, variant), "python")
+        for backend, variants in build_variants.BACKEND_VARIANTS.items()
+        for variant in variants
+    ]
+
+def command_options(command):
+    # Extra flags after the script/binary, e.g. "--kernel soa"
+    for idx, arg in enumerate(command):
+        if arg.startswith("--"):
+            return " ".join(command[idx:])
+    return ""
+
+def load_cost_model(results_dir="results", processor=None, db_path=None):
+    # Seed the model from stored results recorded on the same processor,
+    # preferring the results store over the per-type JSON files
+    model = CostModel()
+    if db_path is not None and os.path.exists(db_path):
+        with ResultsStore(db_path) as store:
+            for b in store.query(processor=processor):
+                model.observe(b["method"], b["n"], b["steps"], b["time"], stored=True)
+        return model
+    if not os.path.isdir(results_dir):
+        return model
+    for filename in os.listdir(results_dir):
+        if not (filename.startswith("results_") and filename.endswith(".json")):
+            continue
         try:
-            if platform.system() == "Linux":
-                with open("/proc/cpuinfo", "r") as f:
-                    for line in f:
-                        if "model name" in line:
-                            processor = line.split(":")[1].strip()
-                            break
-            elif platform.system() == "Windows":
-                import subprocess
-                result = subprocess.run(["wmic", "cpu", "get", "name"], capture_output=True, text=True)
-                lines = result.stdout.strip().split("\n")
-                if len(lines) > 1:
-                    processor = lines[1].strip()
-        except:
-            processor = "Unknown"
-    
-    return {
-        "os": platform.system(),
-        "release": platform.release(),
-        "python": platform.python_version(),
-        "processor": processor or "Unknown",
-        "gpu": get_gpu_info(),
-        "cuda_version": get_cuda_version(),
-    }
+            with open(os.path.join(results_dir, filename), "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if processor is not None and data.get("system", {}).get("processor") != processor:
+            continue
+        for b in data.get("benchmarks", []):
+            model.observe(b["method"], b["n"], b["steps"], b["time"], stored=True)
+    return model
+
+async def report_progress(name, start, predicted, interval, batches=None):
+    while True:
+        await asyncio.sleep(interval)
+        elapsed = time.monotonic() - start
+        expected = f", predicted {predicted:.1f}s" if predicted is not None else ""
+        rate = ""
+        if batches:
+            # Rolling estimate from the streamed batches (the first is warmup)
+            import adaptive
+            steps, seconds, ci = adaptive.estimate(batches[1:] or batches)
+            rate = f", {steps / seconds:.1f} steps/s" + (f" ±{100 * ci:.1f}%" if ci != float("inf") else "")
+        print(f"  ... {name} still running ({elapsed:.0f}s elapsed{expected}{rate})", flush=True)
 
-def run_benchmark(command, name, n, steps):
-    print(f"Benchmarking {name} (N={n}, Steps={steps})...")
+async def read_output(stream, values, batches):
+    # Collect the RESULT/STEPS/CI lines and every streamed RATE batch
+    async for raw in stream:
+        line = raw.decode(errors="replace").strip()
+        key, _, value = line.partition(": ")
+        if key == "RATE":
+            _, batch_steps, batch_seconds = value.split()
+            batches.append((int(batch_steps), float(batch_seconds)))
+        elif key in ("RESULT", "STEPS", "CI"):
+            values[key] = float(value)
+
+async def run_benchmark(command, name, n, steps, timeout=None, predicted=None, progress_interval=10.0):
+    """Run one benchmark subprocess.
+
+    Returns (time, steps, ci, status) where status is "ok", "failed" or
+    "timeout". steps is the number of steps the time covers (measured by the
+    backend in adaptive mode), ci the relative CI half-width or None.
+    """
+    adaptive_run = "--adaptive" in command
+    print(f"Benchmarking {name} (N={n}, Steps={'adaptive' if adaptive_run else steps})...", flush=True)
+    # Construct command
+    cmd = command + [f"--n", str(n), f"--steps", str(steps)]
     try:
-        # Construct command
-        cmd = command + [f"--n", str(n), f"--steps", str(steps)]
-        
-        # Run process
-        result = subprocess.run(
-            cmd, 
-            capture_output=True, 
-            text=True, 
-            check=True
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
         )
-        
-        # Parse output for "RESULT: <float>"
-        for line in result.stdout.splitlines():
-            if line.startswith("RESULT: "):
-                return float(line.split("RESULT: ")[1])
-        return None
-    except subprocess.CalledProcessError as e:
-        print(f"Error running {name}: {e}")
-        # print(e.stderr) # Optional: print stderr
-        return None
     except FileNotFoundError:
         print(f"Executable not found for {name}: {command[0]}")
-        return None
+        return None, steps, None, "failed"
+
+    values = {}
+    batches = []
+    start = time.monotonic()
+    progress = asyncio.create_task(report_progress(name, start, predicted, progress_interval, batches))
+    try:
+        # stderr is drained alongside so a chatty backend cannot fill the pipe
+        await asyncio.wait_for(asyncio.gather(read_output(proc.stdout, values, batches), proc.stderr.read(), proc.wait()), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        print(f"Timeout: {name} exceeded {timeout:.1f}s and was killed.")
+        if len(batches) > 1:
+            # Keep what was streamed before the kill
+            import adaptive
+            measured, seconds, ci = adaptive.estimate(batches[1:])
+            print(f"  Using {len(batches) - 1} streamed batches ({measured} steps)")
+            return seconds, measured, ci, "ok"
+        return None, steps, None, "timeout"
+    finally:
+        progress.cancel()
+
+    if proc.returncode != 0:
+        print(f"Error running {name}: exit status {proc.returncode}")
+        return None, steps, None, "failed"
+
+    if "RESULT" not in values:
+        return None, steps, None, "failed"
+    return values["RESULT"], int(values.get("STEPS", steps)), values.get("CI"), "ok"
+
+async def run_schedule(implementations, n_values, steps, model, budget=None, timeout=None, startup_grace=30.0, progress_interval=10.0,
+                       scenarios=("uniform",), ci_target=None):
+    # ci_target switches the backends that support it to adaptive mode, with
+    # budget (or DEFAULT_ADAPTIVE_BUDGET) as the wall-clock budget per run
+    # Smallest N first so that each method's cost model is fitted before its big runs
+    new_results = []
+    skipped = []
+    schedule = [
+        (scenario, n, impl)
+        for scenario in scenarios
+        for n in sorted(n_values)
+        for impl in implementations
+        if scenario == "uniform" or impl[2] in SCENARIO_TYPES
+    ]
+    native = sorted({impl[1] for impl in implementations if impl[2] not in SCENARIO_TYPES})
+    if native and any(s != "uniform" for s in scenarios):
+        print(f"Only the uniform scenario is run for: {', '.join(native)}")
+
+    for idx, (scenario, n, (cmd, name, impl_type)) in enumerate(schedule, 1):
+        label = name if scenario == "uniform" else f"{name} [{scenario}]"
+        adaptive_run = ci_target is not None and impl_type in ADAPTIVE_TYPES
+        run_budget = (budget or DEFAULT_ADAPTIVE_BUDGET) if adaptive_run else budget
+        # An adaptive run needs at least one step inside its budget
+        predicted = model.predict(name, n, 1 if adaptive_run else steps)
+        # A run predicted past the hard timeout would only be killed
+        exceeded = [(what, limit) for what, limit in (("budget", run_budget), ("timeout", timeout))
+                    if limit is not None and predicted is not None and predicted > limit]
+        if exceeded:
+            what, limit = exceeded[0]
+            print(f"[{idx}/{len(schedule)}] Skipping {label} (N={n}): predicted {predicted:.1f}s exceeds {what} {limit:.1f}s")
+            skipped.append({"method": name, "scenario": scenario, "n": n, "steps": steps, "predicted": predicted})
+            continue
+
+        # Time-box every run: the hard timeout, and the budget plus an allowance
+        # for interpreter startup and JIT warmup (which the RESULT time excludes)
+        budget_limit = run_budget + startup_grace if run_budget is not None else None
+        limits = [t for t in (timeout, budget_limit) if t is not None]
+        run_timeout = min(limits) if limits else None
+
+        print(f"[{idx}/{len(schedule)}] ", end="")
+        run_cmd = cmd if scenario == "uniform" else cmd + ["--scenario", scenario]
+        if adaptive_run:
+            run_cmd = run_cmd + ["--adaptive", "--ci-target", str(ci_target), "--time-budget", str(run_budget)]
+        time_taken, measured, ci, status = await run_benchmark(run_cmd, label, n, steps, run_timeout,
+                                                               None if adaptive_run else predicted, progress_interval)
+        if status == "ok" and time_taken is not None:
+            model.observe(name, n, measured, time_taken)
+            result = {
+                "method": name,
+                "scenario": scenario,
+                "n": n,
+                "steps": measured,
+                "options": command_options(cmd),
+                "time": time_taken,
+                "time_per_step": time_taken / measured
+            }
+            if adaptive_run:
+                result["ci"] = ci if ci is not None and ci != float("inf") else None
+            new_results.append(result)
+        elif status == "timeout":
+            timed_steps = 1 if adaptive_run else steps
+            # Only the budget limit includes the startup grace
+            model.observe_timeout(name, n, timed_steps, run_budget if run_timeout == budget_limit else run_timeout)
+            skipped.append({"method": name, "scenario": scenario, "n": n, "steps": timed_steps, "timeout": run_timeout})
+        else:
+            print(f"Skipping {label} due to failure.")
+
+    return new_results, skipped
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run N-body benchmarks")
     parser.add_argument("--type", choices=["all", "python", "c_cpp", "rust", "go", "cuda"], default="all", help="Type of benchmarks to run")
     parser.add_argument("--n", type=int, nargs="+", default=[1000, 5000], help="N values to test")
     parser.add_argument("--steps", type=int, default=100, help="Number of steps")
+    parser.add_argument("--budget", type=float, default=None, help="Skip runs whose predicted time exceeds this many seconds (with --adaptive: the wall-clock budget of each run, default 10)")
+    parser.add_argument("--timeout", type=float, default=None, help="Hard per-run timeout in seconds")
+    parser.add_argument("--startup-grace", type=float, default=30.0, help="Seconds allowed for startup/compilation on top of --budget before a run is killed")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress reports for a running benchmark")
+    parser.add_argument("--no-history", action="store_true", help="Do not seed the cost model from stored results")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite results store that every sample is appended to")
+    parser.add_argument("--no-variants", action="store_true", help="Skip the Cython/mypyc compiler-flag variants (see src/python/build_variants.py)")
+    parser.add_argument("--adaptive", action="store_true", help="Run the Python backends in growing step batches until the per-step time converges (ignores --steps)")
+    parser.add_argument("--ci-target", type=float, default=DEFAULT_CI_TARGET, help="Relative 95%% CI half-width at which an adaptive run stops")
+    parser.add_argument("--scenario", nargs="+", default=["uniform"],
+                        help="Initial conditions to benchmark: uniform, plummer, cold_collapse, colliding_clusters, disk (see src/python/scenarios.py)")
     args = parser.parse_args()
 
     # Configuration
@@ -103,13 +269,26 @@ if __name__ == "__main__":
     all_implementations = [
         (["python", "src/python/baseline.py"], "Vanilla Python", "python"),
         (["python", "src/python/numpy_impl.py"], "NumPy", "python"),
+        (["python", "src/python/numpy_impl.py", "--kernel", "gemm"], "NumPy (GEMM)", "python"),
         (["python", "src/python/numba_impl.py"], "Numba", "python"),
+        (["python", "src/python/numba_impl.py", "--kernel", "soa"], "Numba (SoA)", "python"),
         (["python", "src/python/jax_impl.py"], "JAX", "python"),
+        # One logical CPU device per core; on a GPU host the mesh is the GPUs
+        (["python", "src/python/jax_impl.py", "--sharded", "--cpu-devices", str(os.cpu_count() or 1)], "JAX (Sharded)", "python"),
         (["python", "src/python/taichi_impl.py"], "Taichi", "python"),
+        (["python", "src/python/taichi_impl.py", "--layout", "soa"], "Taichi (SoA)", "python"),
         (["python", "src/python/cython_runner.py"], "Cython", "python"),
         (["python", "src/python/mypyc_runner.py"], "MyPyc", "python"),
+        (["python", "src/python/ctypes_impl.py"], "C (ctypes)", "python"),
+    ] + (variant_implementations() if args.type in ("all", "python") and not args.no_variants else []) + [
         (["python", "src/python/cuda_impl.py"], "CUDA Python", "python"),
+        (["python", "src/python/cuda_impl.py", "--kernel", "tiled"], "CUDA Python (Tiled)", "python"),
         (["python", "src/python/mp_impl.py"], "Multiprocessing", "python"),
+        (["python", "src/python/thread_impl.py", "--kernel", "numpy"], "Threads (NumPy)", "python"),
+        (["python", "src/python/thread_impl.py", "--kernel", "cython"], "Threads (Cython)", "python"),
+        # Needs Python 3.14+ (or 3.13 with interpreters-pep-734); fails and is skipped otherwise
+        (["python", "src/python/subinterp_impl.py"], "Subinterpreters", "python"),
+        (["python", "src/python/ring_impl.py"], "Ring (Sockets)", "python"),
         (["pypy3", "src/python/baseline.py"], "PyPy", "python"),
         # Native binaries
         (["src/rust_impl/target/release/nbody_rust.exe"] if os.name == 'nt' else ["./src/rust_impl/target/release/nbody_rust"], "Rust (Native)", "rust"),
@@ -124,21 +303,28 @@ if __name__ == "__main__":
         implementations = all_implementations
     else:
         implementations = [i for i in all_implementations if i[2] == args.type]
+    if any("--variant" in i[0] for i in implementations):
+        # Build (or confirm up to date) every variant before timing anything
+        print("Building compiler-flag variants...", flush=True)
+        subprocess.run([sys.executable, "src/python/build_variants.py"])
+    if any(i[1] == "C (ctypes)" for i in implementations):
+        subprocess.run([sys.executable, "src/python/ctypes_impl.py", "--build"])
 
-    new_results = []
-    
-    for n in N_VALUES:
-        for cmd, name, _ in implementations:
-            time_taken = run_benchmark(cmd, name, n, STEPS)
-            if time_taken is not None:
-                new_results.append({
-                    "method": name,
-                    "n": n,
-                    "steps": STEPS,
-                    "time": time_taken
-                })
-            else:
-                print(f"Skipping {name} due to failure.")
+    system_info = get_system_info()
+    if args.no_history:
+        model = CostModel()
+    else:
+        model = load_cost_model("results", processor=system_info["processor"], db_path=args.db)
+
+    new_results, skipped = asyncio.run(run_schedule(
+        implementations, N_VALUES, STEPS, model,
+        budget=args.budget,
+        timeout=args.timeout,
+        startup_grace=args.startup_grace,
+        progress_interval=args.progress_interval,
+        scenarios=args.scenario,
+        ci_target=args.ci_target if args.adaptive else None
+    ))
     
     # Save to specific file based on type
     output_filename = f"results_{args.type}.json"
@@ -146,9 +332,11 @@ if __name__ == "__main__":
     os.makedirs("results", exist_ok=True)
     
     final_data = {
-        "system": get_system_info(),
+        "system": system_info,
         "benchmarks": new_results
     }
+    if skipped:
+        final_data["skipped"] = skipped
             
     print(json.dumps(final_data, indent=2))
     
@@ -156,3 +344,8 @@ if __name__ == "__main__":
         json.dump(final_data, f, indent=2)
     print(f"Results saved to {output_path}")
 
+    if new_results:
+        with ResultsStore(args.db) as store:
+            store.add_samples(system_info, new_results, git_commit=get_git_commit(), run_type=args.type)
+        print(f"{len(new_results)} samples appended to {args.db}")
+
@@ -0,0 +1,202 @@
+import os
+import json
+import sqlite3
+import hashlib
+import subprocess
+import argparse
+from datetime import datetime, timezone
+
+# Append-only SQLite store for benchmark results: one row per sample, keyed by
+# system fingerprint, git commit, method, scenario, N, steps and options. Unlike the
+# results_<type>.json files it is never overwritten, so history across
+# machines and commits is kept and can be queried by index.
+
+DEFAULT_DB = os.path.join("results", "results.db")
+
+SYSTEM_FIELDS = ("os", "release", "python", "processor", "gpu", "cuda_version")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS systems (
+    fingerprint TEXT PRIMARY KEY,
+    os TEXT,
+    release TEXT,
+    python TEXT,
+    processor TEXT,
+    gpu TEXT,
+    cuda_version TEXT
+);
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recorded_at TEXT NOT NULL,
+    fingerprint TEXT NOT NULL REFERENCES systems(fingerprint),
+    git_commit TEXT,
+    run_type TEXT,
+    method TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    steps INTEGER NOT NULL,
+    options TEXT NOT NULL DEFAULT '',
+    time REAL NOT NULL,
+    scenario TEXT NOT NULL DEFAULT 'uniform',
+    ci REAL
+);
+CREATE INDEX IF NOT EXISTS idx_samples_method_n ON samples(method, n, steps);
+CREATE INDEX IF NOT EXISTS idx_samples_fingerprint ON samples(fingerprint, method);
+CREATE INDEX IF NOT EXISTS idx_samples_commit ON samples(git_commit);
+CREATE INDEX IF NOT EXISTS idx_systems_processor ON systems(processor);
+"""
+
+# Columns added after the first release, created on stores that predate them
+MIGRATIONS = {
+    "scenario": "ALTER TABLE samples ADD COLUMN scenario TEXT NOT NULL DEFAULT 'uniform'",
+    # Relative 95% CI half-width of adaptive runs (NULL for fixed-step runs)
+    "ci": "ALTER TABLE samples ADD COLUMN ci REAL",
+}
+POST_MIGRATION_SCHEMA = """
+CREATE INDEX IF NOT EXISTS idx_samples_scenario ON samples(scenario, method);
+"""
+
+def system_fingerprint(system_info):
+    # Stable hash of the fields that identify a machine/toolchain
+    key = json.dumps({k: system_info.get(k) for k in SYSTEM_FIELDS}, sort_keys=True)
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+def get_git_commit(cwd=None):
+    # GIT_COMMIT lets the Docker runs (which have no .git) record the commit
+    if os.environ.get("GIT_COMMIT"):
+        return os.environ["GIT_COMMIT"]
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=cwd)
+        if result.returncode == 0:
+            return result.stdout.strip()
+    except FileNotFoundError:
+        pass
+    return None
+
+class ResultsStore:
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(samples)")}
+        with self.conn:
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    self.conn.execute(statement)
+        self.conn.executescript(POST_MIGRATION_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_samples(self, system_info, benchmarks, git_commit=None, run_type=None, recorded_at=None):
+        """Append one row per benchmark entry. Returns the system fingerprint."""
+        fingerprint = system_fingerprint(system_info)
+        recorded_at = recorded_at or datetime.now(timezone.utc).isoformat()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO systems (fingerprint, os, release, python, processor, gpu, cuda_version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (fingerprint,) + tuple(system_info.get(k) for k in SYSTEM_FIELDS),
+            )
+            self.conn.executemany(
+                "INSERT INTO samples (recorded_at, fingerprint, git_commit, run_type, method, n, steps, options, time, scenario, ci) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (recorded_at, fingerprint, git_commit, run_type, b["method"], b["n"], b["steps"],
+                     b.get("options", ""), b["time"], b.get("scenario", "uniform"), b.get("ci"))
+                    for b in benchmarks
+                ],
+            )
+        return fingerprint
+
+    def import_json(self, path, git_commit=None):
+        """Append the samples of a results_<type>.json file. Returns the number of rows added."""
+        with open(path, "r") as f:
+            data = json.load(f)
+        benchmarks = data.get("benchmarks", [])
+        if benchmarks:
+            run_type = os.path.basename(path)[len("results_"):-len(".json")]
+            mtime = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc).isoformat()
+            self.add_samples(data.get("system", {}), benchmarks, git_commit, run_type, recorded_at=mtime)
+        return len(benchmarks)
+
+    def _where(self, method=None, n=None, steps=None, fingerprint=None, processor=None, git_commit=None, since=None, options=None,
+               scenario=None):
+        clauses = []
+        params = []
+
+        def add_filter(column, value):
+            if value is None:
+                return
+            if isinstance(value, (list, tuple, set)):
+                value = list(value)
+                clauses.append(f"{column} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+
+        add_filter("s.method", method)
+        add_filter("s.n", n)
+        add_filter("s.steps", steps)
+        add_filter("s.fingerprint", fingerprint)
+        add_filter("y.processor", processor)
+        add_filter("s.git_commit", git_commit)
+        add_filter("s.options", options)
+        add_filter("s.scenario", scenario)
+        if since is not None:
+            clauses.append("s.recorded_at >= ?")
+            params.append(since)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def query_sql(self, **filters):
+        """SQL text and parameters for the filtered samples joined with their system."""
+        where, params = self._where(**filters)
+        sql = (
+            "SELECT s.recorded_at, s.fingerprint, s.git_commit, s.run_type, s.method, s.n, s.steps, "
+            "s.options, s.scenario, s.time, s.time / s.steps AS time_per_step, s.ci, y.processor, y.gpu, y.python "
+            "FROM samples s JOIN systems y ON s.fingerprint = y.fingerprint"
+            f"{where} ORDER BY s.id"
+        )
+        return sql, params
+
+    def query(self, **filters):
+        """Filtered samples as a list of dicts. See _where for the accepted filters."""
+        sql, params = self.query_sql(**filters)
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark results store")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Append results_*.json files to the store")
+    imp.add_argument("files", nargs="+", help="JSON result files")
+    q = sub.add_parser("query", help="Print matching samples")
+    q.add_argument("--method", nargs="+", default=None)
+    q.add_argument("--n", type=int, nargs="+", default=None)
+    q.add_argument("--processor", default=None)
+    q.add_argument("--commit", default=None)
+    q.add_argument("--scenario", nargs="+", default=None)
+    args = parser.parse_args()
+
+    with ResultsStore(args.db) as store:
+        if args.command == "import":
+            for path in args.files:
+                print(f"{path}: {store.import_json(path)} samples")
+        else:
+            for row in store.query(method=args.method, n=args.n, processor=args.processor, git_commit=args.commit,
+                                   scenario=args.scenario):
+                print(json.dumps(row))
@@ -7,6 +7,10 @@ if "%1"=="--force" set FORCE_BUILD=1
 echo Creating results directory...
 if not exist "results" mkdir results
 
+REM Recorded with every sample in results\results.db (git is not available inside the containers)
+set GIT_COMMIT=
+for /f %%i in ('git rev-parse HEAD 2^>nul') do set GIT_COMMIT=%%i
+
 echo.
 echo ==========================================
 echo Building and Running Python Benchmarks...
@@ -26,7 +30,7 @@ if "%SHOULD_BUILD%"=="0" (
     docker build -f docker/python.Dockerfile -t nbody-python .
     if %ERRORLEVEL% NEQ 0 exit /b %ERRORLEVEL%
 )
-docker run --gpus all --rm -v %cd%/results:/app/results nbody-python
+docker run --gpus all --rm -e GIT_COMMIT=%GIT_COMMIT% -v %cd%/results:/app/results nbody-python
 
 echo.
 echo ==========================================
@@ -47,7 +51,7 @@ if "%SHOULD_BUILD%"=="0" (
     docker build -f docker/c_cpp.Dockerfile -t nbody-c-cpp .
     if %ERRORLEVEL% NEQ 0 exit /b %ERRORLEVEL%
 )
-docker run --rm -v %cd%/results:/app/results nbody-c-cpp
+docker run --rm -e GIT_COMMIT=%GIT_COMMIT% -v %cd%/results:/app/results nbody-c-cpp
 
 echo.
 echo ==========================================
@@ -68,7 +72,7 @@ if "%SHOULD_BUILD%"=="0" (
     docker build -f docker/rust.Dockerfile -t nbody-rust .
     if %ERRORLEVEL% NEQ 0 exit /b %ERRORLEVEL%
 )
-docker run --rm -v %cd%/results:/app/results nbody-rust
+docker run --rm -e GIT_COMMIT=%GIT_COMMIT% -v %cd%/results:/app/results nbody-rust
 
 echo.
 echo ==========================================
@@ -89,7 +93,7 @@ if "%SHOULD_BUILD%"=="0" (
     docker build -f docker/go.Dockerfile -t nbody-go .
     if %ERRORLEVEL% NEQ 0 exit /b %ERRORLEVEL%
 )
-docker run --rm -v %cd%/results:/app/results nbody-go
+docker run --rm -e GIT_COMMIT=%GIT_COMMIT% -v %cd%/results:/app/results nbody-go
 
 echo.
 echo ==========================================
@@ -110,7 +114,7 @@ if "%SHOULD_BUILD%"=="0" (
     docker build -f docker/cuda.Dockerfile -t nbody-cuda .
     if %ERRORLEVEL% NEQ 0 exit /b %ERRORLEVEL%
 )
-docker run --gpus all --rm -v %cd%/results:/app/results nbody-cuda
+docker run --gpus all --rm -e GIT_COMMIT=%GIT_COMMIT% -v %cd%/results:/app/results nbody-cuda
 
 echo.
 echo ==========================================
@@ -8,6 +8,9 @@ fi
 echo "Creating results directory..."
 mkdir -p results
 
+# Recorded with every sample in results/results.db (git is not available inside the containers)
+GIT_COMMIT=$(git rev-parse HEAD 2>/dev/null)
+
 echo
 echo "=========================================="
 echo "Building and Running Python Benchmarks..."
@@ -26,7 +29,7 @@ else
     docker build -f docker/python.Dockerfile -t nbody-python .
     if [ $? -ne 0 ]; then exit $?; fi
 fi
-docker run --rm -v "$(pwd)/results:/app/results" nbody-python
+docker run --rm -e GIT_COMMIT="$GIT_COMMIT" -v "$(pwd)/results:/app/results" nbody-python
 
 echo
 echo "=========================================="
@@ -46,7 +49,7 @@ else
     docker build -f docker/c_cpp.Dockerfile -t nbody-c-cpp .
     if [ $? -ne 0 ]; then exit $?; fi
 fi
-docker run --rm -v "$(pwd)/results:/app/results" nbody-c-cpp
+docker run --rm -e GIT_COMMIT="$GIT_COMMIT" -v "$(pwd)/results:/app/results" nbody-c-cpp
 
 echo
 echo "=========================================="
@@ -66,7 +69,7 @@ else
     docker build -f docker/rust.Dockerfile -t nbody-rust .
     if [ $? -ne 0 ]; then exit $?; fi
 fi
-docker run --rm -v "$(pwd)/results:/app/results" nbody-rust
+docker run --rm -e GIT_COMMIT="$GIT_COMMIT" -v "$(pwd)/results:/app/results" nbody-rust
 
 echo
 echo "=========================================="
@@ -86,7 +89,7 @@ else
     docker build -f docker/go.Dockerfile -t nbody-go .
     if [ $? -ne 0 ]; then exit $?; fi
 fi
-docker run --rm -v "$(pwd)/results:/app/results" nbody-go
+docker run --rm -e GIT_COMMIT="$GIT_COMMIT" -v "$(pwd)/results:/app/results" nbody-go
 
 echo
 echo "=========================================="
@@ -107,7 +110,7 @@ else
     if [ $? -ne 0 ]; then exit $?; fi
 fi
 # Requires --gpus all flag
-docker run --gpus all --rm -v "$(pwd)/results:/app/results" nbody-cuda
+docker run --gpus all --rm -e GIT_COMMIT="$GIT_COMMIT" -v "$(pwd)/results:/app/results" nbody-cuda
 
 echo
 echo "=========================================="
@@ -1,5 +1,6 @@
 #include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
 #include <math.h>
 #include <time.h>
 
@@ -9,9 +10,7 @@ typedef struct {
     double mass;
 } Planet;
 
-void compute_forces(Planet* planets, int n, double dt) {
-    double soft_epsilon = 1e-9;
-    
+void compute_forces(Planet* planets, int n, double dt, double soft_epsilon) {
     for (int i = 0; i < n; i++) {
         double fx = 0.0, fy = 0.0, fz = 0.0;
         double p1x = planets[i].x;
@@ -48,6 +47,20 @@ void update_positions(Planet* planets, int n, double dt) {
     }
 }
 
+// Entry point for the shared-library build (gcc -shared -fPIC -DNBODY_NO_MAIN),
+// called in-process from src/python/ctypes_impl.py on a NumPy buffer that
+// has the Planet layout (an (N, 7) float64 array), without copying.
+#ifdef _WIN32
+__declspec(dllexport)
+#endif
+void nbody_run(Planet* planets, int n, int steps, double dt, double soft_epsilon) {
+    for (int s = 0; s < steps; s++) {
+        compute_forces(planets, n, dt, soft_epsilon);
+        update_positions(planets, n, dt);
+    }
+}
+
+#ifndef NBODY_NO_MAIN
 int main(int argc, char* argv[]) {
     int n = 100;
     int steps = 100;
@@ -81,8 +94,9 @@ int main(int argc, char* argv[]) {
     clock_t start = clock();
     
     double dt = 0.01;
+    double soft_epsilon = 1e-9;
     for (int s = 0; s < steps; s++) {
-        compute_forces(planets, n, dt);
+        compute_forces(planets, n, dt, soft_epsilon);
         update_positions(planets, n, dt);
     }
     
@@ -95,3 +109,4 @@ int main(int argc, char* argv[]) {
     free(planets);
     return 0;
 }
+#endif
@@ -0,0 +1,114 @@
+import math
+import time
+
+# Time-boxed adaptive timing shared by the backend CLIs (--adaptive). Instead
+# of one run of a fixed --steps, the backend's run_simulation is called with
+# growing step batches (1, 2, 4, ... steps) until a batch takes at least
+# --min-batch seconds, then with batches of that size. Every batch is streamed
+# to stdout as
+#
+#   RATE: <steps per second> <batch steps> <batch seconds>
+#
+# and the run stops once the relative 95% confidence interval of the per-step
+# time over the last few batches is below --ci-target, or once the wall-clock
+# --time-budget is spent. The final lines are
+#
+#   STEPS: <steps measured>
+#   CI: <relative CI half-width>
+#   RESULT: <seconds for those steps>
+#
+# so bench_runner can normalize to time per step. Standard library only, so the
+# PyPy baseline can use it too.
+
+DEFAULT_CI_TARGET = 0.02
+DEFAULT_TIME_BUDGET = 10.0
+DEFAULT_MIN_BATCH = 0.1
+
+# Batches in the rolling estimate
+WINDOW = 5
+MIN_SAMPLES = 3
+
+# Two-sided 95% Student t quantiles by degrees of freedom
+T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262}
+
+def estimate(batches, window=WINDOW):
+    """Rolling per-step estimate over the last `window` (steps, seconds) batches.
+
+    Returns (steps, seconds, relative CI half-width). The CI is inf with fewer
+    than two batches.
+    """
+    recent = batches[-window:]
+    steps = sum(k for k, _ in recent)
+    seconds = sum(s for _, s in recent)
+    if len(recent) < 2:
+        return steps, seconds, math.inf
+    per_step = [s / k for k, s in recent]
+    mean = sum(per_step) / len(per_step)
+    var = sum((t - mean) ** 2 for t in per_step) / (len(per_step) - 1)
+    half_width = T_95.get(len(per_step) - 1, 1.96) * math.sqrt(var / len(per_step))
+    return steps, seconds, half_width / mean if mean > 0 else math.inf
+
+def measure(run, ci_target=DEFAULT_CI_TARGET, time_budget=DEFAULT_TIME_BUDGET, min_batch=DEFAULT_MIN_BATCH, emit=print):
+    """Call run(k) -> seconds for k steps in growing batches until converged or out of time.
+
+    Returns (steps, seconds, ci, reason) with reason "converged" or "budget".
+    The first batch (JIT compilation, caches) and batches shorter than
+    min_batch are not used in the estimate, unless nothing else was measured.
+    """
+    start = time.monotonic()
+    batches = []
+    short = []
+    k = 1
+    warmup = True
+    while True:
+        batch_start = time.monotonic()
+        seconds = run(k)
+        wall = time.monotonic() - batch_start
+        emit(f"RATE: {k / seconds if seconds > 0 else math.inf} {k} {seconds}", flush=True)
+
+        first = warmup
+        if warmup:
+            warmup = False
+            short.append((k, seconds))
+        elif seconds < min_batch:
+            short.append((k, seconds))
+        else:
+            batches.append((k, seconds))
+        if seconds < min_batch:
+            # Grow towards min_batch, at most doubling; keep the size after that
+            k = max(k + 1, min(2 * k, int(k * min_batch / max(seconds, 1e-9)) + 1))
+
+        steps, total, ci = estimate(batches)
+        if len(batches) >= MIN_SAMPLES and ci <= ci_target:
+            return steps, total, ci, "converged"
+        # Stop if the next batch (about as long as this one, unless this was
+        # the warmup with its one-off compilation) would not fit
+        if time.monotonic() - start + (0.0 if first else wall) > time_budget:
+            if not batches:
+                # Too slow for even one full batch: report what was measured
+                batches = short[-1:]
+                steps, total, ci = estimate(batches)
+            return steps, total, ci, "budget"
+
+def add_arguments(parser):
+    parser.add_argument("--adaptive", action="store_true", help="Run growing step batches until the timing converges (ignores --steps)")
+    parser.add_argument("--ci-target", type=float, default=DEFAULT_CI_TARGET, help="Relative 95%% CI half-width to stop at (--adaptive)")
+    parser.add_argument("--time-budget", type=float, default=DEFAULT_TIME_BUDGET, help="Wall-clock seconds before stopping unconverged (--adaptive)")
+    parser.add_argument("--min-batch", type=float, default=DEFAULT_MIN_BATCH, help="Seconds a batch must take to count (--adaptive)")
+
+def argv(args):
+    # The adaptive flags, for passing on to another backend's CLI
+    if not args.adaptive:
+        return []
+    return ["--adaptive", "--ci-target", str(args.ci_target), "--time-budget", str(args.time_budget), "--min-batch", str(args.min_batch)]
+
+def steps_label(args):
+    return "adaptive" if args.adaptive else args.steps
+
+def run_cli(args, run):
+    """Adaptive run for a backend CLI; run(k) times k steps."""
+    steps, seconds, ci, reason = measure(run, args.ci_target, args.time_budget, args.min_batch)
+    print(f"Time: {seconds / steps:.6f} seconds per step over {steps} steps (CI ±{100 * ci:.1f}%, {reason})")
+    print(f"STEPS: {steps}")
+    print(f"CI: {ci}")
+    print(f"RESULT: {seconds}")
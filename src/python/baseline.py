@@ -3,6 +3,7 @@ import random
 import time
 import math
 from typing import List
+import adaptive
 
 class Planet:
     def __init__(self, x: float, y: float, z: float, vx: float, vy: float, vz: float, mass: float) -> None:
@@ -48,20 +49,27 @@ def update_positions(planets: List[Planet], dt: float) -> None:
         p.y += p.vy * dt
         p.z += p.vz * dt
 
-def run_simulation(n_bodies: int, n_steps: int, dt: float = 0.01) -> float:
+def run_simulation(n_bodies: int, n_steps: int, dt: float = 0.01, scenario: str = "uniform") -> float:
     planets: List[Planet] = []
-    # Initialize random planets
-    random.seed(42)
-    for _ in range(n_bodies):
-        planets.append(Planet(
-            x=random.uniform(-100, 100),
-            y=random.uniform(-100, 100),
-            z=random.uniform(-100, 100),
-            vx=random.uniform(-1, 1),
-            vy=random.uniform(-1, 1),
-            vz=random.uniform(-1, 1),
-            mass=random.uniform(1, 10)
-        ))
+    if scenario == "uniform":
+        # Initialize random planets
+        random.seed(42)
+        for _ in range(n_bodies):
+            planets.append(Planet(
+                x=random.uniform(-100, 100),
+                y=random.uniform(-100, 100),
+                z=random.uniform(-100, 100),
+                vx=random.uniform(-1, 1),
+                vy=random.uniform(-1, 1),
+                vz=random.uniform(-1, 1),
+                mass=random.uniform(1, 10)
+            ))
+    else:
+        # Clustered scenarios are generated with NumPy, imported only here so
+        # the uniform run needs nothing beyond the standard library (PyPy)
+        import scenarios
+        for row in scenarios.generate_rows(scenario, n_bodies):
+            planets.append(Planet(*row))
 
     start_time = time.time()
     
@@ -76,10 +84,15 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Vanilla Python N-body benchmark")
     parser.add_argument("--n", type=int, default=100, help="Number of bodies")
     parser.add_argument("--steps", type=int, default=100, help="Number of steps")
+    parser.add_argument("--scenario", default="uniform", help="Initial conditions (see scenarios.py; non-uniform ones need NumPy)")
+    adaptive.add_arguments(parser)
     args = parser.parse_args()
 
-    print(f"Running Vanilla Python N-body with N={args.n}, Steps={args.steps}")
-    duration = run_simulation(args.n, args.steps)
+    print(f"Running Vanilla Python N-body with N={args.n}, Steps={adaptive.steps_label(args)}, Scenario={args.scenario}")
+    if args.adaptive:
+        adaptive.run_cli(args, lambda steps: run_simulation(args.n, steps, scenario=args.scenario))
+        raise SystemExit(0)
+    duration = run_simulation(args.n, args.steps, scenario=args.scenario)
     print(f"Time: {duration:.4f} seconds")
     # Output for simple parsing
     print(f"RESULT: {duration}")
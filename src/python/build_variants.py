@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import sysconfig
+
+# Compiler-flag matrix for the Cython and mypyc extensions. Every variant is
+# built side by side under its own module name (cython_impl_o3_native,
+# mypyc_impl_pgo, ...) into src/python/variants/, so one benchmark run can
+# compare them all:
+#
+#   python src/python/build_variants.py                 # build everything that is stale
+#   python src/python/cython_runner.py --variant PGO --n 1000
+#
+# A variant is rebuilt only when its key changes: a hash of the source file,
+# the flags, the compiler and the Python version, recorded in
+# variants/manifest.json.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+VARIANT_DIR = os.path.join(HERE, "variants")
+MANIFEST = os.path.join(VARIANT_DIR, "manifest.json")
+
+SOURCES = {"cython": "cython_impl.pyx", "mypyc": "mypyc_impl.py"}
+
+# name -> (compile flags, link flags, profile-guided)
+VARIANTS = {
+    "O2": (["-O2"], [], False),
+    "O3-native": (["-O3", "-march=native"], [], False),
+    "fast-math": (["-O3", "-march=native", "-ffast-math"], [], False),
+    "OpenMP": (["-O3", "-march=native", "-fopenmp"], ["-fopenmp"], False),
+    "PGO": (["-O3", "-march=native"], [], True),
+}
+
+# mypyc output has no parallel loops, so -fopenmp would only link libgomp
+BACKEND_VARIANTS = {
+    "cython": ["O2", "O3-native", "fast-math", "OpenMP", "PGO"],
+    "mypyc": ["O2", "O3-native", "fast-math", "PGO"],
+}
+
+# Training workload for the PGO build (kept small; it runs instrumented code)
+PGO_TRAINING = "import {module} as m; m.run_simulation({n}, {steps})"
+PGO_SIZES = {"cython": (1000, 20), "mypyc": (200, 5)}
+
+def module_name(backend, variant):
+    return f"{os.path.splitext(SOURCES[backend])[0]}_{variant.lower().replace('-', '_')}"
+
+def method_name(backend, variant):
+    # The name bench_runner records, e.g. "Cython (O3-native)"
+    return f"{'Cython' if backend == 'cython' else 'MyPyc'} ({variant})"
+
+def compiler_version():
+    cc = (sysconfig.get_config_var("CC") or "cc").split()[0]
+    try:
+        result = subprocess.run([cc, "--version"], capture_output=True, text=True)
+        return result.stdout.splitlines()[0] if result.returncode == 0 and result.stdout else cc
+    except OSError:
+        return cc
+
+def variant_key(backend, variant):
+    with open(os.path.join(HERE, SOURCES[backend]), "rb") as f:
+        source = f.read()
+    cflags, ldflags, pgo = VARIANTS[variant]
+    payload = json.dumps([cflags, ldflags, pgo, compiler_version(), platform.python_version(), sys.platform])
+    return hashlib.sha256(source + payload.encode()).hexdigest()[:16]
+
+def load_manifest():
+    if not os.path.exists(MANIFEST):
+        return {}
+    with open(MANIFEST, "r") as f:
+        return json.load(f)
+
+def save_manifest(manifest):
+    os.makedirs(VARIANT_DIR, exist_ok=True)
+    with open(MANIFEST, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+def built_module(module):
+    # Path of the compiled extension for `module` in VARIANT_DIR, or None
+    suffix = sysconfig.get_config_var("EXT_SUFFIX")
+    path = os.path.join(VARIANT_DIR, module + suffix)
+    return path if os.path.exists(path) else None
+
+def is_current(backend, variant, manifest=None):
+    manifest = load_manifest() if manifest is None else manifest
+    module = module_name(backend, variant)
+    return built_module(module) is not None and manifest.get(module, {}).get("key") == variant_key(backend, variant)
+
+def _extensions(backend, source, module):
+    # Extension objects for the renamed copy of the source
+    if backend == "cython":
+        import numpy
+        from Cython.Build import cythonize
+        exts = cythonize(source, quiet=True, force=True)
+        for ext in exts:
+            ext.include_dirs.append(numpy.get_include())
+        return exts
+    from mypyc.build import mypycify
+    # mypy has to find the modules mypyc_impl imports (scenarios.py)
+    os.environ["MYPYPATH"] = HERE
+    return mypycify([source])
+
+def _setup(backend, source, module, build_temp, cflags, ldflags):
+    from setuptools import setup
+    exts = _extensions(backend, source, module)
+    for ext in exts:
+        # Appended after the defaults, so e.g. -O2 overrides mypyc's -O3
+        ext.extra_compile_args = list(ext.extra_compile_args or []) + cflags
+        ext.extra_link_args = list(ext.extra_link_args or []) + ldflags
+    setup(
+        name=module,
+        ext_modules=exts,
+        script_args=["-q", "build_ext", "--force", "--build-lib", VARIANT_DIR, "--build-temp", build_temp],
+        zip_safe=False,
+    )
+
+def build(backend, variant, log=print):
+    """Compile one variant into VARIANT_DIR (unconditionally). Returns the module name."""
+    if os.name == "nt":
+        raise RuntimeError("Build variants use GCC/Clang flags and are not supported with MSVC")
+    cflags, ldflags, pgo = VARIANTS[variant]
+    module = module_name(backend, variant)
+    work = os.path.join(VARIANT_DIR, "build", module)
+    shutil.rmtree(work, ignore_errors=True)
+    os.makedirs(work)
+
+    # The module name comes from the file name, so build from a renamed copy
+    source = os.path.join(work, module + os.path.splitext(SOURCES[backend])[1])
+    shutil.copyfile(os.path.join(HERE, SOURCES[backend]), source)
+
+    cwd = os.getcwd()
+    os.chdir(work)
+    try:
+        build_temp = os.path.join(work, "temp")
+        if pgo:
+            profile_dir = os.path.join(work, "profile")
+            log(f"  {module}: instrumented build")
+            _setup(backend, os.path.basename(source), module, build_temp,
+                   cflags + [f"-fprofile-generate={profile_dir}"], ldflags + [f"-fprofile-generate={profile_dir}"])
+            n, steps = PGO_SIZES[backend]
+            log(f"  {module}: training run (N={n}, steps={steps})")
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join([VARIANT_DIR, HERE, os.environ.get("PYTHONPATH", "")]))
+            subprocess.run([sys.executable, "-c", PGO_TRAINING.format(module=module, n=n, steps=steps)],
+                           cwd=HERE, env=env, check=True)
+            cflags = cflags + [f"-fprofile-use={profile_dir}", "-fprofile-correction", "-Wno-missing-profile"]
+        log(f"  {module}: {' '.join(cflags)}")
+        _setup(backend, os.path.basename(source), module, build_temp, cflags, ldflags)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(os.path.dirname(work), ignore_errors=True)
+    return module
+
+def ensure(backends=None, variants=None, force=False, log=print):
+    """Build every requested variant whose key changed. Returns {module: status}."""
+    manifest = load_manifest()
+    statuses = {}
+    for backend in backends or list(BACKEND_VARIANTS):
+        for variant in BACKEND_VARIANTS[backend]:
+            if variants and variant not in variants:
+                continue
+            module = module_name(backend, variant)
+            if not force and is_current(backend, variant, manifest):
+                statuses[module] = "up to date"
+                continue
+            try:
+                build(backend, variant, log)
+            except (Exception, SystemExit) as e:
+                log(f"  {module}: build failed ({e})")
+                statuses[module] = "failed"
+                continue
+            manifest[module] = {"backend": backend, "variant": variant, "key": variant_key(backend, variant),
+                                "flags": " ".join(VARIANTS[variant][0])}
+            save_manifest(manifest)
+            statuses[module] = "built"
+    return statuses
+
+def import_variant(backend, variant):
+    """Import a built variant module; raises ImportError if it is missing or stale."""
+    import importlib
+    if not is_current(backend, variant):
+        raise ImportError(f"{module_name(backend, variant)} is not built or out of date; run build_variants.py first")
+    if VARIANT_DIR not in sys.path:
+        sys.path.insert(0, VARIANT_DIR)
+    return importlib.import_module(module_name(backend, variant))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the Cython/mypyc compiler-flag variants")
+    parser.add_argument("--backend", nargs="+", choices=list(BACKEND_VARIANTS), default=None, help="Backends to build (default: all)")
+    parser.add_argument("--variant", nargs="+", choices=list(VARIANTS), default=None, help="Variants to build (default: all)")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the source hash is unchanged")
+    parser.add_argument("--list", action="store_true", help="Show the variants and whether they are current")
+    args = parser.parse_args()
+
+    if args.list:
+        manifest = load_manifest()
+        for backend, names in BACKEND_VARIANTS.items():
+            for variant in names:
+                state = "current" if is_current(backend, variant, manifest) else "stale"
+                print(f"{method_name(backend, variant):<22} {module_name(backend, variant):<26} {' '.join(VARIANTS[variant][0]):<36} {state}")
+        raise SystemExit(0)
+
+    statuses = ensure(args.backend, args.variant, args.force)
+    for module, status in statuses.items():
+        print(f"{module}: {status}")
+    if "failed" in statuses.values():
+        raise SystemExit(1)
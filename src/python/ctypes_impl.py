@@ -0,0 +1,171 @@
+import argparse
+import ctypes
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+import scenarios
+import adaptive
+
+# In-process bridge to the native C kernel (src/c_impl/nbody.c) via ctypes.
+# The C code works on an array of
+#
+#   typedef struct { double x, y, z, vx, vy, vz, mass; } Planet;
+#
+# which has exactly the memory layout of a C-contiguous (N, 7) float64 NumPy
+# array, so the array's buffer is handed to C by pointer: no copy, no
+# serialization, no process boundary. pos, vel and mass are views into it.
+#
+# The library is built explicitly, next to the source (the Docker image does
+# the same at build time):
+#
+#   python src/python/ctypes_impl.py --build
+
+C_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "c_impl")
+SOURCE = os.path.join(C_DIR, "nbody.c")
+LIBRARY = os.path.join(C_DIR, "nbody.dll" if os.name == "nt" else "libnbody.so")
+
+PLANET_FIELDS = 7
+
+_lib = None
+
+def build_library(cc="gcc"):
+    # Same kernel and optimization level as the standalone binary, without main()
+    cmd = [cc, "-O3", "-shared", "-fPIC", "-DNBODY_NO_MAIN", "-o", LIBRARY, SOURCE, "-lm"]
+    subprocess.run(cmd, check=True)
+
+def load_library():
+    global _lib
+    if _lib is None:
+        if not os.path.exists(LIBRARY):
+            raise FileNotFoundError(f"{LIBRARY} not found; build it with: python src/python/ctypes_impl.py --build")
+        if os.path.getmtime(LIBRARY) < os.path.getmtime(SOURCE):
+            # An older build may have a different nbody_run signature
+            raise RuntimeError(f"{LIBRARY} is older than {os.path.basename(SOURCE)}; "
+                               "rebuild it with: python src/python/ctypes_impl.py --build")
+        lib = ctypes.CDLL(LIBRARY)
+        # ndpointer checks dtype, rank and contiguity and passes the data
+        # pointer; it never copies
+        lib.nbody_run.argtypes = [
+            np.ctypeslib.ndpointer(dtype=np.float64, ndim=2, flags="C_CONTIGUOUS,WRITEABLE"),
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_double,
+            ctypes.c_double,
+        ]
+        lib.nbody_run.restype = None
+        _lib = lib
+    return _lib
+
+def bind(planets):
+    """step(n_steps, dt, soft_epsilon) for one Planet-layout array, with the pointer
+    converted once. Skips ndpointer's per-call checks, which dominate the
+    cost of a call at small N."""
+    if planets.shape[1] != PLANET_FIELDS or not planets.flags.c_contiguous or planets.dtype != np.float64:
+        raise ValueError(f"expected a C-contiguous (N, {PLANET_FIELDS}) float64 Planet-layout array")
+    # Second prototype of the same symbol taking a raw pointer
+    raw = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_double, ctypes.c_double)(
+        ctypes.cast(load_library().nbody_run, ctypes.c_void_p).value)
+    ptr = ctypes.c_void_p(planets.ctypes.data)
+    n = ctypes.c_int(planets.shape[0])
+
+    def step(n_steps, dt=0.01, soft_epsilon=1e-9):
+        # planets stays referenced by this closure, so the pointer stays valid
+        raw(ptr, n, n_steps, dt, soft_epsilon)
+    step.planets = planets
+    return step
+
+def pack(pos, vel, mass):
+    """One (N, 7) Planet-layout array holding pos, vel and mass (a single copy)."""
+    planets = np.empty((pos.shape[0], PLANET_FIELDS))
+    planets[:, 0:3] = pos
+    planets[:, 3:6] = vel
+    planets[:, 6] = np.reshape(mass, -1)
+    return planets
+
+def views(planets):
+    """(pos, vel, mass) views into a Planet-layout array."""
+    return planets[:, 0:3], planets[:, 3:6], planets[:, 6]
+
+def run_steps(planets, n_steps, dt=0.01, soft_epsilon=1e-9):
+    # Advances the planets in place
+    if planets.shape[1] != PLANET_FIELDS:
+        raise ValueError(f"expected an (N, {PLANET_FIELDS}) Planet-layout array, got {planets.shape}")
+    load_library().nbody_run(planets, planets.shape[0], n_steps, dt, soft_epsilon)
+
+def run_simulation(n_bodies, n_steps, dt=0.01, scenario="uniform"):
+    planets = pack(*scenarios.generate(scenario, n_bodies))
+    load_library()
+
+    start_time = time.time()
+    run_steps(planets, n_steps, dt)
+    end_time = time.time()
+    return end_time - start_time
+
+def measure_overhead(n_values=(1, 4, 16, 64, 256), calls=20000):
+    """Mean time per single-step call into the C library (through run_steps
+    and through a bind() stepper) and into Cython's run_steps, on identical
+    state. At N=1 there is no pair work, so the time is almost pure call
+    overhead (argument conversion and dispatch)."""
+    try:
+        import cython_impl
+    except ImportError:
+        cython_impl = None
+
+    rows = []
+    for n in n_values:
+        pos, vel, mass = scenarios.generate("uniform", n)
+        planets = pack(pos, vel, mass)
+        calls_n = max(10, calls // max(1, n * n // 64))
+
+        start = time.perf_counter()
+        for _ in range(calls_n):
+            run_steps(planets, 1, 1e-12)
+        c_time = (time.perf_counter() - start) / calls_n
+
+        step = bind(pack(pos, vel, mass))
+        start = time.perf_counter()
+        for _ in range(calls_n):
+            step(1, 1e-12)
+        bound_time = (time.perf_counter() - start) / calls_n
+
+        cython_time = None
+        if cython_impl is not None:
+            c_pos, c_vel, c_mass = pos.copy(), vel.copy(), np.ascontiguousarray(mass[:, 0])
+            start = time.perf_counter()
+            for _ in range(calls_n):
+                cython_impl.run_steps(c_pos, c_vel, c_mass, 1, 1e-12)
+            cython_time = (time.perf_counter() - start) / calls_n
+        rows.append((n, c_time, bound_time, cython_time))
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Native C kernel called in-process through ctypes")
+    parser.add_argument("--n", type=int, default=100, help="Number of bodies")
+    parser.add_argument("--steps", type=int, default=100, help="Number of steps")
+    parser.add_argument("--overhead", action="store_true", help="Measure per-call overhead at small N against the Cython extension")
+    parser.add_argument("--build", action="store_true", help=f"Build {os.path.basename(LIBRARY)} from {os.path.basename(SOURCE)} and exit")
+    scenarios.add_argument(parser)
+    adaptive.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.build:
+        print(f"Building {LIBRARY}...")
+        build_library()
+        sys.exit(0)
+
+    if args.overhead:
+        print(f"{'N':>5} {'ctypes (us/call)':>17} {'bound (us/call)':>16} {'Cython (us/call)':>17}")
+        for n, c_time, bound_time, cython_time in measure_overhead():
+            cython = f"{cython_time * 1e6:17.2f}" if cython_time is not None else f"{'n/a':>17}"
+            print(f"{n:>5} {c_time * 1e6:17.2f} {bound_time * 1e6:16.2f} {cython}")
+        sys.exit(0)
+
+    print(f"Running C (ctypes) N-body with N={args.n}, Steps={adaptive.steps_label(args)}, Scenario={args.scenario}")
+    if args.adaptive:
+        adaptive.run_cli(args, lambda steps: run_simulation(args.n, steps, scenario=args.scenario))
+        sys.exit(0)
+    duration = run_simulation(args.n, args.steps, scenario=args.scenario)
+    print(f"Time: {duration:.4f} seconds")
+    print(f"RESULT: {duration}")
@@ -2,7 +2,10 @@ import argparse
 import time
 import numpy as np
 import math
-from numba import cuda
+from numba import cuda, float32
+import tuning
+import scenarios
+import adaptive
 
 @cuda.jit
 def compute_forces_kernel(pos, vel, mass, dt, soft_epsilon):
@@ -48,59 +51,188 @@ def update_positions_kernel(pos, vel, dt):
         pos[i, 1] += vel[i, 1] * dt
         pos[i, 2] += vel[i, 2] * dt
 
-def run_simulation(n_bodies, n_steps, dt=0.01, soft_epsilon=1e-9):
-    # Initialize implementation using standard numpy
-    np.random.seed(42)
-    pos = np.random.uniform(-100, 100, (n_bodies, 3)).astype(np.float32)
-    vel = np.random.uniform(-1, 1, (n_bodies, 3)).astype(np.float32)
-    mass = np.random.uniform(1, 10, (n_bodies, 1)).astype(np.float32)
-    
-    # Check for CUDA
+_tiled_kernels = {}
+
+def get_tiled_forces_kernel(tile):
+    # Shared array sizes must be compile-time constants, so build (and cache)
+    # one kernel per tile size. Launch it with threadsperblock == tile.
+    if tile in _tiled_kernels:
+        return _tiled_kernels[tile]
+
+    @cuda.jit
+    def compute_forces_tiled_kernel(pos, vel, mass, dt, soft_epsilon):
+        sh_x = cuda.shared.array(tile, float32)
+        sh_y = cuda.shared.array(tile, float32)
+        sh_z = cuda.shared.array(tile, float32)
+        sh_m = cuda.shared.array(tile, float32)
+
+        i = cuda.grid(1)
+        tx = cuda.threadIdx.x
+        n = pos.shape[0]
+
+        x1 = 0.0
+        y1 = 0.0
+        z1 = 0.0
+        if i < n:
+            x1 = pos[i, 0]
+            y1 = pos[i, 1]
+            z1 = pos[i, 2]
+
+        fx = 0.0
+        fy = 0.0
+        fz = 0.0
+
+        # Every thread of the block takes part in loading each tile, even
+        # threads with i >= n, so that syncthreads is reached uniformly.
+        for t in range((n + tile - 1) // tile):
+            j = t * tile + tx
+            if j < n:
+                sh_x[tx] = pos[j, 0]
+                sh_y[tx] = pos[j, 1]
+                sh_z[tx] = pos[j, 2]
+                sh_m[tx] = mass[j, 0]
+            else:
+                # Padding bodies have zero mass and contribute nothing
+                sh_x[tx] = 0.0
+                sh_y[tx] = 0.0
+                sh_z[tx] = 0.0
+                sh_m[tx] = 0.0
+            cuda.syncthreads()
+
+            if i < n:
+                for k in range(tile):
+                    if t * tile + k != i:
+                        dx = sh_x[k] - x1
+                        dy = sh_y[k] - y1
+                        dz = sh_z[k] - z1
+
+                        dist_sq = dx*dx + dy*dy + dz*dz + soft_epsilon
+                        dist = math.sqrt(dist_sq)
+                        f = sh_m[k] / (dist_sq * dist)
+
+                        fx += f * dx
+                        fy += f * dy
+                        fz += f * dz
+            cuda.syncthreads()
+
+        if i < n:
+            vel[i, 0] += fx * dt
+            vel[i, 1] += fy * dt
+            vel[i, 2] += fz * dt
+
+    _tiled_kernels[tile] = compute_forces_tiled_kernel
+    return compute_forces_tiled_kernel
+
+def init_bodies(n_bodies, scenario="uniform"):
+    return tuple(a.astype(np.float32) for a in scenarios.generate(scenario, n_bodies))
+
+def simulate(pos, vel, mass, n_steps, dt=0.01, soft_epsilon=1e-9, kernel="global", threadsperblock=256):
+    """Run n_steps on the device and return (pos, vel, elapsed).
+
+    Works on a real GPU or under the CUDA simulator (NUMBA_ENABLE_CUDASIM=1).
+    """
     if not cuda.is_available():
         raise RuntimeError("CUDA is not available on this system.")
 
-    # Transfer to device
+    n_bodies = pos.shape[0]
     d_pos = cuda.to_device(pos)
     d_vel = cuda.to_device(vel)
     d_mass = cuda.to_device(mass)
-    
-    threadsperblock = 256
+
+    if kernel == "tiled":
+        forces_kernel = get_tiled_forces_kernel(threadsperblock)
+    elif kernel == "global":
+        forces_kernel = compute_forces_kernel
+    else:
+        raise ValueError(f"Unknown kernel: {kernel}")
     blockspergrid = (n_bodies + (threadsperblock - 1)) // threadsperblock
-    
-    # Warmup compilation
-    compute_forces_kernel[blockspergrid, threadsperblock](d_pos, d_vel, d_mass, dt, soft_epsilon)
-    update_positions_kernel[blockspergrid, threadsperblock](d_pos, d_vel, dt)
+
+    # Warmup compilation on scratch copies so the timed run starts from the initial state
+    w_vel = cuda.to_device(vel)
+    w_pos = cuda.to_device(pos)
+    forces_kernel[blockspergrid, threadsperblock](w_pos, w_vel, d_mass, dt, soft_epsilon)
+    update_positions_kernel[blockspergrid, threadsperblock](w_pos, w_vel, dt)
     cuda.synchronize()
-    
+
     start_time = time.time()
-    
+
     for _ in range(n_steps):
-        compute_forces_kernel[blockspergrid, threadsperblock](d_pos, d_vel, d_mass, dt, soft_epsilon)
+        forces_kernel[blockspergrid, threadsperblock](d_pos, d_vel, d_mass, dt, soft_epsilon)
         update_positions_kernel[blockspergrid, threadsperblock](d_pos, d_vel, dt)
-    
+
     cuda.synchronize()
     end_time = time.time()
-    
-    # Optional: copy back if needed for verification
-    # pos = d_pos.copy_to_host()
-    
-    return end_time - start_time
+
+    return d_pos.copy_to_host(), d_vel.copy_to_host(), end_time - start_time
+
+def reference_step(pos, vel, mass, n_steps, dt=0.01, soft_epsilon=1e-9):
+    # Float64 NumPy reference used to check the device kernels
+    pos = pos.astype(np.float64)
+    vel = vel.astype(np.float64)
+    mass = mass.astype(np.float64)
+    for _ in range(n_steps):
+        diff = pos[None, :, :] - pos[:, None, :]
+        dist_sq = np.sum(diff**2, axis=2) + soft_epsilon
+        force_scalar = mass.T / (dist_sq * np.sqrt(dist_sq))
+        np.fill_diagonal(force_scalar, 0.0)
+        vel += np.sum(force_scalar[..., None] * diff, axis=1) * dt
+        pos += vel * dt
+    return pos, vel
+
+def verify(n_bodies=70, threadsperblock=16, rtol=1e-4):
+    """Check both force kernels against the NumPy reference. Returns True if they agree.
+
+    Compares the velocity change of one step, starting from rest so that it
+    is exactly a * dt without float32 cancellation against the initial
+    velocity. The defaults are small enough for the CUDA simulator, and N is
+    not a multiple of the block size, so the padded last tile is covered.
+    """
+    pos, _, mass = init_bodies(n_bodies)
+    vel = np.zeros_like(pos)
+    _, ref_dv = reference_step(pos, vel, mass, 1)
+    scale = np.abs(ref_dv).max()
+    ok = True
+    for kernel in ("global", "tiled"):
+        _, out_dv, _ = simulate(pos, vel, mass, 1, kernel=kernel, threadsperblock=threadsperblock)
+        err = np.abs(out_dv - ref_dv).max() / scale
+        print(f"{kernel}: max relative velocity-change error {err:.2e}")
+        ok = ok and err < rtol
+    return ok
+
+def run_simulation(n_bodies, n_steps, dt=0.01, soft_epsilon=1e-9, kernel="global", threadsperblock=None, scenario="uniform"):
+    # threadsperblock defaults to the tuned value for this machine (see tuning.py)
+    params = tuning.resolve(f"cuda-{kernel}", n_bodies, {"threadsperblock": 256}, threadsperblock=threadsperblock)
+    pos, vel, mass = init_bodies(n_bodies, scenario)
+    _, _, duration = simulate(pos, vel, mass, n_steps, dt, soft_epsilon, kernel, params["threadsperblock"])
+    return duration
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Numba CUDA N-body benchmark")
     parser.add_argument("--n", type=int, default=100, help="Number of bodies")
     parser.add_argument("--steps", type=int, default=100, help="Number of steps")
+    parser.add_argument("--kernel", choices=["global", "tiled"], default="global", help="Force kernel (tiled = shared-memory tiles)")
+    parser.add_argument("--block-size", type=int, default=None, help="Threads per block (and tile size for the tiled kernel); default: tuned value or 256")
+    parser.add_argument("--verify", action="store_true", help="Check both kernels against NumPy on a small problem and exit")
+    scenarios.add_argument(parser)
+    adaptive.add_arguments(parser)
     args = parser.parse_args()
 
     try:
         if not cuda.is_available():
-           print("CUDA not detected. Exiting.")
+           print("CUDA not detected. Exiting. (Set NUMBA_ENABLE_CUDASIM=1 to run on the simulator.)")
            exit(1)
 
-        print(f"Running Numba CUDA N-body with N={args.n}, Steps={args.steps}")
-        duration = run_simulation(args.n, args.steps)
-        print(f"Time: {duration:.4f} seconds")
-        print(f"RESULT: {duration}")
+        if args.verify:
+            exit(0 if verify() else 1)
+
+        print(f"Running Numba CUDA N-body with N={args.n}, Steps={adaptive.steps_label(args)}, Kernel={args.kernel}, Scenario={args.scenario}")
+        run = lambda steps: run_simulation(args.n, steps, kernel=args.kernel, threadsperblock=args.block_size, scenario=args.scenario)
+        if args.adaptive:
+            adaptive.run_cli(args, run)
+        else:
+            duration = run(args.steps)
+            print(f"Time: {duration:.4f} seconds")
+            print(f"RESULT: {duration}")
     except Exception as e:
         print(f"Error: {e}")
         exit(1)
@@ -7,31 +7,32 @@ import time
 import numpy as np
 cimport numpy as np
 from libc.math cimport sqrt
+from cython.parallel cimport prange
+import scenarios
 
 # We need to define types for speed
 # Using double precision (float64)
 
-def run_simulation(int n_bodies, int n_steps, double dt=0.01, double soft_epsilon=1e-9):
-    # Initialize implementation
-    # We use typed memoryviews or arrays
-    
-    # Initialize with numpy
-    np.random.seed(42)
-    cdef double[:, ::1] pos = np.random.uniform(-100, 100, (n_bodies, 3))
-    cdef double[:, ::1] vel = np.random.uniform(-1, 1, (n_bodies, 3))
-    cdef double[::1] mass = np.random.uniform(1, 10, (n_bodies,))
-    
+def init_bodies(int n_bodies, str scenario="uniform"):
+    # Initialize with numpy (see scenarios.py); mass is 1-D here
+    pos, vel, mass = scenarios.generate(scenario, n_bodies)
+    return pos, vel, np.ascontiguousarray(mass[:, 0])
+
+def run_steps(double[:, ::1] pos, double[:, ::1] vel, const double[::1] mass,
+              int n_steps, double dt=0.01, double soft_epsilon=1e-9):
+    # Advances pos and vel in place
+    cdef int n_bodies = pos.shape[0]
     cdef int i, j, step
     cdef double fx, fy, fz
     cdef double dx, dy, dz
     cdef double dist_sq, dist, f
     cdef double p1_x, p1_y, p1_z
     
-    start_time = time.time()
-    
+    # prange runs serially unless the module is compiled with -fopenmp (the
+    # OpenMP build variant, see build_variants.py)
     with nogil:
         for step in range(n_steps):
-            for i in range(n_bodies):
+            for i in prange(n_bodies, schedule="static"):
                 fx = 0.0
                 fy = 0.0
                 fz = 0.0
@@ -66,6 +67,172 @@ def run_simulation(int n_bodies, int n_steps, double dt=0.01, double soft_epsilo
                 pos[i, 0] = pos[i, 0] + vel[i, 0] * dt
                 pos[i, 1] = pos[i, 1] + vel[i, 1] * dt
                 pos[i, 2] = pos[i, 2] + vel[i, 2] * dt
-                
+
+def run_simulation(int n_bodies, int n_steps, double dt=0.01, double soft_epsilon=1e-9, str scenario="uniform"):
+    pos, vel, mass = init_bodies(n_bodies, scenario)
+    
+    start_time = time.time()
+    run_steps(pos, vel, mass, n_steps, dt, soft_epsilon)
     end_time = time.time()
     return end_time - start_time
+
+def run_steps_diagnostics(double[:, ::1] pos, double[:, ::1] vel, const double[::1] mass,
+                          int n_steps, double dt, double soft_epsilon, int every,
+                          double[::1] phi, double[:, ::1] records):
+    # run_steps with diagnostics fused into the force pass. On every
+    # `every`-th step (starting with the first) the j-loop also accumulates
+    # phi_i = -sum_j m_j / r_ij, and records gets one row of
+    # (step, kinetic, potential, px, py, pz, virial) for the state at the
+    # start of that step. The force pass is a prange like run_steps, with the
+    # diagnostic sums as OpenMP reductions (in-place adds).
+    cdef int n_bodies = pos.shape[0]
+    cdef int i, j, step
+    cdef int rec = 0
+    cdef bint diag
+    cdef double fx, fy, fz, pot, mi
+    cdef double dx, dy, dz
+    cdef double dist_sq, dist, f
+    cdef double p1_x, p1_y, p1_z
+    cdef double kinetic, potential, px, py, pz, virial
+
+    with nogil:
+        for step in range(n_steps):
+            diag = step % every == 0
+            kinetic = 0.0
+            potential = 0.0
+            px = 0.0
+            py = 0.0
+            pz = 0.0
+            virial = 0.0
+
+            for i in prange(n_bodies, schedule="static"):
+                fx = 0.0
+                fy = 0.0
+                fz = 0.0
+                pot = 0.0
+                p1_x = pos[i, 0]
+                p1_y = pos[i, 1]
+                p1_z = pos[i, 2]
+
+                for j in range(n_bodies):
+                    if i == j:
+                        continue
+
+                    dx = pos[j, 0] - p1_x
+                    dy = pos[j, 1] - p1_y
+                    dz = pos[j, 2] - p1_z
+
+                    dist_sq = dx*dx + dy*dy + dz*dz + soft_epsilon
+                    dist = sqrt(dist_sq)
+
+                    f = mass[j] / (dist_sq * dist)
+                    if diag:
+                        pot = pot - mass[j] / dist
+
+                    fx = fx + f * dx
+                    fy = fy + f * dy
+                    fz = fz + f * dz
+
+                if diag:
+                    mi = mass[i]
+                    phi[i] = pot
+                    kinetic += 0.5 * mi * (vel[i, 0]*vel[i, 0] + vel[i, 1]*vel[i, 1] + vel[i, 2]*vel[i, 2])
+                    potential += 0.5 * mi * pot
+                    px += mi * vel[i, 0]
+                    py += mi * vel[i, 1]
+                    pz += mi * vel[i, 2]
+                    virial += mi * (p1_x * fx + p1_y * fy + p1_z * fz)
+
+                # Update velocity
+                vel[i, 0] = vel[i, 0] + fx * dt
+                vel[i, 1] = vel[i, 1] + fy * dt
+                vel[i, 2] = vel[i, 2] + fz * dt
+
+            if diag:
+                records[rec, 0] = step
+                records[rec, 1] = kinetic
+                records[rec, 2] = potential
+                records[rec, 3] = px
+                records[rec, 4] = py
+                records[rec, 5] = pz
+                records[rec, 6] = virial
+                rec = rec + 1
+
+            for i in range(n_bodies):
+                pos[i, 0] = pos[i, 0] + vel[i, 0] * dt
+                pos[i, 1] = pos[i, 1] + vel[i, 1] * dt
+                pos[i, 2] = pos[i, 2] + vel[i, 2] * dt
+
+def run_simulation_diagnostics(int n_bodies, int n_steps, int every, double dt=0.01, double soft_epsilon=1e-9,
+                               str scenario="uniform"):
+    """Time run_steps_diagnostics. Returns (elapsed, records, phi)."""
+    pos, vel, mass = init_bodies(n_bodies, scenario)
+    phi = np.zeros(n_bodies)
+    records = np.zeros(((n_steps + every - 1) // every, 7))
+
+    start_time = time.time()
+    run_steps_diagnostics(pos, vel, mass, n_steps, dt, soft_epsilon, every, phi, records)
+    end_time = time.time()
+    return end_time - start_time, records, phi
+
+def iter_simulation(int n_bodies, int n_steps, int every=10, double dt=0.01, double soft_epsilon=1e-9,
+                    str scenario="uniform"):
+    """Yield (step, pos, vel) after every `every` steps (and after the last step).
+
+    pos and vel are read-only NumPy views of the live state, valid until the
+    generator is resumed.
+    """
+    pos, vel, mass = init_bodies(n_bodies, scenario)
+    pos_view = pos.view()
+    vel_view = vel.view()
+    pos_view.flags.writeable = False
+    vel_view.flags.writeable = False
+
+    done = 0
+    while done < n_steps:
+        chunk = min(every, n_steps - done)
+        run_steps(pos, vel, mass, chunk, dt, soft_epsilon)
+        done += chunk
+        yield done, pos_view, vel_view
+
+def compute_forces_chunk(const double[:, ::1] pos, const double[::1] mass, double[:, ::1] acc,
+                         int start, int end, double soft_epsilon=1e-9):
+    # Accelerations for rows [start, end) written into acc, with the GIL
+    # released so several threads can work on disjoint row blocks of the
+    # same shared arrays.
+    cdef int n_bodies = pos.shape[0]
+    cdef int i, j
+    cdef double fx, fy, fz
+    cdef double dx, dy, dz
+    cdef double dist_sq, dist, f
+    cdef double p1_x, p1_y, p1_z
+
+    with nogil:
+        for i in range(start, end):
+            fx = 0.0
+            fy = 0.0
+            fz = 0.0
+            p1_x = pos[i, 0]
+            p1_y = pos[i, 1]
+            p1_z = pos[i, 2]
+
+            for j in range(n_bodies):
+                if i == j:
+                    continue
+
+                dx = pos[j, 0] - p1_x
+                dy = pos[j, 1] - p1_y
+                dz = pos[j, 2] - p1_z
+
+                dist_sq = dx*dx + dy*dy + dz*dz + soft_epsilon
+                dist = sqrt(dist_sq)
+
+                f = mass[j] / (dist_sq * dist)
+
+                fx = fx + f * dx
+                fy = fy + f * dy
+                fz = fz + f * dz
+
+            acc[i, 0] = fx
+            acc[i, 1] = fy
+            acc[i, 2] = fz
@@ -5,28 +5,59 @@ import os
 # Ensure the compiled module is in path
 sys.path.append(os.path.join(os.getcwd(), 'src', 'python'))
 
-# Try importing the compiled module.
-# If build_ext --inplace was run in root, it might be in src/python or root depending on setup.py
-# Our setup.py says "src/python/cython_impl.pyx", so typically it builds in place next to it.
-# So we need to be careful about import.
-try:
-    # If running from root, and file is src/python/cython_impl.clike...
-    # We should add src/python to path
-    import cython_impl
-except ImportError:
+import scenarios
+import build_variants
+import adaptive
+
+def load_module(variant=None):
+    # A named build variant (see build_variants.py) or the default in-place build
+    if variant is not None:
+        try:
+            return build_variants.import_variant("cython", variant)
+        except ImportError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+    # Try importing the compiled module.
+    # If build_ext --inplace was run in root, it might be in src/python or root depending on setup.py
+    # Our setup.py says "src/python/cython_impl.pyx", so typically it builds in place next to it.
+    # So we need to be careful about import.
     try:
-        from src.python import cython_impl
+        # If running from root, and file is src/python/cython_impl.clike...
+        # We should add src/python to path
+        import cython_impl
     except ImportError:
-        print("Error: Could not import cython_impl. Make sure to compile it first.")
-        sys.exit(1)
+        try:
+            from src.python import cython_impl
+        except ImportError:
+            print("Error: Could not import cython_impl. Make sure to compile it first.")
+            sys.exit(1)
+    return cython_impl
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Cython N-body benchmark")
     parser.add_argument("--n", type=int, default=100, help="Number of bodies")
     parser.add_argument("--steps", type=int, default=100, help="Number of steps")
+    parser.add_argument("--diag-every", type=int, default=None, help="Fuse energy/momentum/virial diagnostics into every K-th step and report the overhead")
+    parser.add_argument("--variant", choices=build_variants.BACKEND_VARIANTS["cython"], default=None, help="Run a compiler-flag build variant (build it first with build_variants.py)")
+    scenarios.add_argument(parser)
+    adaptive.add_arguments(parser)
     args = parser.parse_args()
+    cython_impl = load_module(args.variant)
+    label = "Cython" if args.variant is None else f"Cython ({args.variant})"
+
+    if args.diag_every is not None:
+        print(f"Running {label} N-body with N={args.n}, Steps={args.steps}, Scenario={args.scenario}, Diagnostics every {args.diag_every} steps")
+        plain = cython_impl.run_simulation(args.n, args.steps, scenario=args.scenario)
+        duration, records, _ = cython_impl.run_simulation_diagnostics(args.n, args.steps, args.diag_every, scenario=args.scenario)
+        scenarios.report_diagnostics(records, plain, duration)
+        print(f"RESULT: {duration}")
+        sys.exit(0)
 
-    print(f"Running Cython N-body with N={args.n}, Steps={args.steps}")
-    duration = cython_impl.run_simulation(args.n, args.steps)
+    print(f"Running {label} N-body with N={args.n}, Steps={adaptive.steps_label(args)}, Scenario={args.scenario}")
+    if args.adaptive:
+        adaptive.run_cli(args, lambda steps: cython_impl.run_simulation(args.n, steps, scenario=args.scenario))
+        sys.exit(0)
+    duration = cython_impl.run_simulation(args.n, args.steps, scenario=args.scenario)
     print(f"Time: {duration:.4f} seconds")
     print(f"RESULT: {duration}")
@@ -1,8 +1,23 @@
 import argparse
+import functools
+import os
 import time
+import numpy as np
 import jax
 import jax.numpy as jnp
 from jax import jit
+from jax.sharding import Mesh, NamedSharding, PartitionSpec
+import scenarios
+import adaptive
+
+try:
+    from jax import shard_map
+except ImportError:
+    # JAX < 0.7
+    from jax.experimental.shard_map import shard_map
+
+# Mesh axis the bodies are split along in the sharded mode
+AXIS = "bodies"
 
 @jit
 def compute_forces_and_update(pos, vel, mass, dt, soft_epsilon=1e-9):
@@ -25,14 +40,122 @@ def compute_forces_and_update(pos, vel, mass, dt, soft_epsilon=1e-9):
     
     return new_pos, new_vel
 
-def run_simulation(n_bodies, n_steps, dt=0.01):
-    # Initialize bodies
+@jit
+def run_steps(pos, vel, mass, n_steps, dt, soft_epsilon=1e-9):
+    # n_steps updates inside one compiled loop (n_steps is traced, so chunks
+    # of different lengths share a single compilation)
+    def body(_, state):
+        return compute_forces_and_update(state[0], state[1], mass, dt, soft_epsilon)
+    return jax.lax.fori_loop(0, n_steps, body, (pos, vel))
+
+def set_cpu_devices(count):
+    """Expose `count` logical CPU devices. Must run before JAX initializes its
+    backend (the first jax.devices() call or computation); same effect as
+    XLA_FLAGS=--xla_force_host_platform_device_count=<count>."""
+    if "jax_num_cpu_devices" in jax.config.values:
+        jax.config.update("jax_num_cpu_devices", count)
+    else:
+        flag = f"--xla_force_host_platform_device_count={count}"
+        os.environ["XLA_FLAGS"] = f"{os.environ.get('XLA_FLAGS', '')} {flag}".strip()
+
+def accelerations(pos_i, pos_j, mass_j, soft_epsilon=1e-9):
+    # Acceleration on the bodies pos_i from the bodies (pos_j, mass_j); same
+    # terms as compute_forces_and_update
+    diff = pos_j[None, :, :] - pos_i[:, None, :]
+    dist_sq = jnp.sum(diff**2, axis=2) + soft_epsilon
+    force_scalar = mass_j.T / (dist_sq * jnp.sqrt(dist_sq))
+    return jnp.sum(force_scalar[..., None] * diff, axis=1)
+
+def make_mesh(n_devices=None):
+    devices = jax.devices()
+    return Mesh(np.array(devices[:n_devices or len(devices)]), (AXIS,))
+
+def make_sharded_runner(mesh, dt, soft_epsilon=1e-9, comm="allgather"):
+    """Jitted run(pos, vel, mass, n_steps) with the bodies split across the
+    mesh. Each device integrates its own block of bodies; the forces on it come
+    from all positions, either all-gathered once per step ("allgather") or
+    passed device to device around a ring ("ring", one block in flight, so XLA
+    can overlap the transfer with the force computation)."""
+    n_devices = mesh.devices.size
+    ring = [(d, (d + 1) % n_devices) for d in range(n_devices)]
+
+    def local_step(pos, vel, mass):
+        if comm == "allgather":
+            all_pos = jax.lax.all_gather(pos, AXIS, tiled=True)
+            all_mass = jax.lax.all_gather(mass, AXIS, tiled=True)
+            acc = accelerations(pos, all_pos, all_mass, soft_epsilon)
+        elif comm == "ring":
+            def visit(_, carry):
+                acc, block_pos, block_mass = carry
+                acc = acc + accelerations(pos, block_pos, block_mass, soft_epsilon)
+                return acc, jax.lax.ppermute(block_pos, AXIS, ring), jax.lax.ppermute(block_mass, AXIS, ring)
+            acc, block_pos, block_mass = jax.lax.fori_loop(0, n_devices - 1, visit, (jnp.zeros_like(pos), pos, mass))
+            acc = acc + accelerations(pos, block_pos, block_mass, soft_epsilon)
+        else:
+            raise ValueError(f"Unknown comm: {comm}")
+
+        # Update velocity and position (semi-implicit Euler)
+        new_vel = vel + acc * dt
+        new_pos = pos + new_vel * dt
+        return new_pos, new_vel
+
+    spec = PartitionSpec(AXIS)
+    step = shard_map(local_step, mesh=mesh, in_specs=(spec, spec, spec), out_specs=(spec, spec))
+
+    @jit
+    def run(pos, vel, mass, n_steps):
+        return jax.lax.fori_loop(0, n_steps, lambda _, state: step(state[0], state[1], mass), (pos, vel))
+    return run
+
+@functools.lru_cache(maxsize=None)
+def sharded_runner(n_devices, dt, comm="allgather"):
+    # Cached so repeated runs (adaptive batches, --scaling) reuse one compilation
+    mesh = make_mesh(n_devices)
+    return mesh, make_sharded_runner(mesh, dt, comm=comm)
+
+def shard_bodies(pos, vel, mass, mesh):
+    """Place the bodies on the mesh, padded with zero-mass bodies at the origin
+    to a multiple of the device count (they exert no force). The first N rows
+    of the results are the real bodies."""
+    n_devices = mesh.devices.size
+    pad = -pos.shape[0] % n_devices
+    if pad:
+        pos, vel, mass = (jnp.concatenate([a, jnp.zeros((pad, a.shape[1]), a.dtype)]) for a in (pos, vel, mass))
+    sharding = NamedSharding(mesh, PartitionSpec(AXIS))
+    return tuple(jax.device_put(a, sharding) for a in (pos, vel, mass))
+
+def init_bodies(n_bodies, scenario="uniform"):
+    # The uniform workload keeps JAX's own PRNG stream; other scenarios come
+    # from scenarios.py, in JAX's default precision
+    if scenario != "uniform":
+        return tuple(jnp.asarray(a) for a in scenarios.generate(scenario, n_bodies))
+
     key = jax.random.PRNGKey(42)
     key1, key2, key3 = jax.random.split(key, 3)
-    
+
     pos = jax.random.uniform(key1, (n_bodies, 3), minval=-100, maxval=100)
     vel = jax.random.uniform(key2, (n_bodies, 3), minval=-1, maxval=1)
     mass = jax.random.uniform(key3, (n_bodies, 1), minval=1, maxval=10)
+    return pos, vel, mass
+
+def iter_simulation(n_bodies, n_steps, every=10, dt=0.01, scenario="uniform"):
+    """Yield (step, pos, vel) after every `every` steps (and after the last step).
+
+    pos and vel are immutable JAX arrays, so they are safe to keep; on CPU
+    np.asarray() on them is a zero-copy read-only view.
+    """
+    pos, vel, mass = init_bodies(n_bodies, scenario)
+
+    done = 0
+    while done < n_steps:
+        chunk = min(every, n_steps - done)
+        pos, vel = run_steps(pos, vel, mass, chunk, dt)
+        done += chunk
+        yield done, pos, vel
+
+def run_simulation(n_bodies, n_steps, dt=0.01, scenario="uniform"):
+    # Initialize bodies
+    pos, vel, mass = init_bodies(n_bodies, scenario)
     
     # JIT compile the function
     step_fn = jit(compute_forces_and_update)
@@ -48,13 +171,91 @@ def run_simulation(n_bodies, n_steps, dt=0.01):
     end_time = time.time()
     return end_time - start_time
 
+def run_simulation_sharded(n_bodies, n_steps, dt=0.01, n_devices=None, comm="allgather", scenario="uniform"):
+    mesh, run = sharded_runner(n_devices or len(jax.devices()), dt, comm)
+    pos, vel, mass = shard_bodies(*init_bodies(n_bodies, scenario), mesh)
+
+    # Warmup (compilation; n_steps is traced, so one compile covers every length)
+    jax.block_until_ready(run(pos, vel, mass, 1))
+
+    start_time = time.time()
+    pos, vel = run(pos, vel, mass, n_steps)
+    pos.block_until_ready()
+    end_time = time.time()
+    return end_time - start_time
+
+def run_simulation_single(n_bodies, n_steps, dt=0.01, scenario="uniform"):
+    # run_steps on the default device, compiled before timing (the reference
+    # for the sharded mode)
+    pos, vel, mass = init_bodies(n_bodies, scenario)
+    jax.block_until_ready(run_steps(pos, vel, mass, 1, dt))
+
+    start_time = time.time()
+    pos, vel = run_steps(pos, vel, mass, n_steps, dt)
+    pos.block_until_ready()
+    end_time = time.time()
+    return end_time - start_time
+
+def scaling(n_bodies, n_steps, comm="allgather", scenario="uniform"):
+    """[(devices, seconds)] for the sharded mode on 1, 2, 4, ... up to all
+    devices, plus the single-device JIT as (0, seconds) first."""
+    results = [(0, run_simulation_single(n_bodies, n_steps, scenario=scenario))]
+    total = len(jax.devices())
+    counts = []
+    p = 1
+    while p <= total:
+        counts.append(p)
+        p *= 2
+    if counts[-1] != total:
+        counts.append(total)
+    for p in counts:
+        results.append((p, run_simulation_sharded(n_bodies, n_steps, n_devices=p, comm=comm, scenario=scenario)))
+    return results
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="JAX N-body benchmark")
     parser.add_argument("--n", type=int, default=100, help="Number of bodies")
     parser.add_argument("--steps", type=int, default=100, help="Number of steps")
+    parser.add_argument("--sharded", action="store_true", help="Split the bodies across devices with shard_map")
+    parser.add_argument("--devices", type=int, default=None, help="Devices in the mesh for --sharded (default: all)")
+    parser.add_argument("--comm", choices=["allgather", "ring"], default="allgather", help="How shards see the other positions: all_gather once per step, or ppermute around a ring")
+    parser.add_argument("--cpu-devices", type=int, default=None, help="Expose this many logical CPU devices (like XLA_FLAGS=--xla_force_host_platform_device_count)")
+    parser.add_argument("--scaling", action="store_true", help="Time --sharded on 1, 2, 4, ... devices against the single-device JIT")
+    scenarios.add_argument(parser)
+    adaptive.add_arguments(parser)
     args = parser.parse_args()
 
-    print(f"Running JAX N-body with N={args.n}, Steps={args.steps}")
-    duration = run_simulation(args.n, args.steps)
+    if args.cpu_devices is not None:
+        set_cpu_devices(args.cpu_devices)
+
+    if args.scaling:
+        print(f"JAX sharded scaling with N={args.n}, Steps={args.steps}, Comm={args.comm}, Scenario={args.scenario}, "
+              f"Devices={len(jax.devices())} x {jax.devices()[0].platform}")
+        results = scaling(args.n, args.steps, args.comm, args.scenario)
+        single = results[0][1]
+        print(f"Single-device JIT: {single:.4f} seconds")
+        for p, duration in results[1:]:
+            print(f"Devices={p}: {duration:.4f} seconds, speedup {single / duration:.2f}x, efficiency {single / duration / p:.0%}")
+        raise SystemExit(0)
+
+    if args.sharded:
+        n_devices = args.devices or len(jax.devices())
+        print(f"Running JAX (sharded) N-body with N={args.n}, Steps={adaptive.steps_label(args)}, Devices={n_devices}, "
+              f"Comm={args.comm}, Scenario={args.scenario}")
+        run = lambda steps: run_simulation_sharded(args.n, steps, n_devices=n_devices, comm=args.comm, scenario=args.scenario)
+        if args.adaptive:
+            adaptive.run_cli(args, run)
+            raise SystemExit(0)
+        duration = run(args.steps)
+        print(f"Time: {duration:.4f} seconds")
+        print(f"RESULT: {duration}")
+        raise SystemExit(0)
+
+    print(f"Running JAX N-body with N={args.n}, Steps={adaptive.steps_label(args)}, Scenario={args.scenario}")
+    if args.adaptive:
+        # The first batch includes the JIT compilation and is not counted
+        adaptive.run_cli(args, lambda steps: run_simulation(args.n, steps, scenario=args.scenario))
+        raise SystemExit(0)
+    duration = run_simulation(args.n, args.steps, scenario=args.scenario)
     print(f"Time: {duration:.4f} seconds")
     print(f"RESULT: {duration}")
\ No newline at end of file
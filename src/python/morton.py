@@ -0,0 +1,50 @@
+import numpy as np
+
+# Morton (Z-order) sorting of bodies. Interleaving the bits of the quantized
+# x, y and z coordinates gives a key whose sort order keeps spatially close
+# bodies close in memory, so tiles of consecutive bodies are compact boxes.
+
+BITS = 21  # 3 * 21 = 63 bits fit in a uint64 key
+
+def _part1by2(x):
+    # Spread the low 21 bits of x so there are two zero bits between each
+    x = x & np.uint64(0x1FFFFF)
+    x = (x | (x << np.uint64(32))) & np.uint64(0x1F00000000FFFF)
+    x = (x | (x << np.uint64(16))) & np.uint64(0x1F0000FF0000FF)
+    x = (x | (x << np.uint64(8))) & np.uint64(0x100F00F00F00F00F)
+    x = (x | (x << np.uint64(4))) & np.uint64(0x10C30C30C30C30C3)
+    x = (x | (x << np.uint64(2))) & np.uint64(0x1249249249249249)
+    return x
+
+def morton_keys(pos):
+    """uint64 Morton keys for an (N, 3) array of positions, over its bounding cube."""
+    lo = pos.min(axis=0)
+    span = float((pos.max(axis=0) - lo).max()) or 1.0
+    scale = ((1 << BITS) - 1) / span
+    q = ((pos - lo) * scale).astype(np.uint64)
+    return (_part1by2(q[:, 0])
+            | (_part1by2(q[:, 1]) << np.uint64(1))
+            | (_part1by2(q[:, 2]) << np.uint64(2)))
+
+class MortonOrder:
+    """Keeps bodies in Morton order and remembers where each one came from.
+
+    perm[k] is the original index of the body currently stored at row k.
+    """
+
+    def __init__(self, n_bodies):
+        self.perm = np.arange(n_bodies)
+
+    def reorder(self, *arrays):
+        """Sort the rows of every array (pos first) by the Morton key of pos, in place."""
+        order = np.argsort(morton_keys(arrays[0]), kind="stable")
+        for arr in arrays:
+            arr[:] = arr[order]
+        self.perm = self.perm[order]
+        return order
+
+    def to_original(self, arr):
+        """Copy of arr with its rows back in the original body order."""
+        out = np.empty_like(arr)
+        out[self.perm] = arr
+        return out
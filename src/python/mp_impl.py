@@ -3,6 +3,8 @@ import time
 import math
 import random
 import multiprocessing
+import tuning
+import adaptive
 
 # We need a worker function that can be pickled
 # The strategy: Split the outer loop (i) among processes.
@@ -71,28 +73,38 @@ def compute_chunk_force(start_idx, end_idx, all_planets, dt, soft_epsilon=1e-9):
         
     return updates
 
-def run_simulation(n_bodies, n_steps, dt=0.01, n_processes=None):
-    if n_processes is None:
-        n_processes = multiprocessing.cpu_count()
+def run_simulation(n_bodies, n_steps, dt=0.01, n_processes=None, chunks_per_process=None, scenario="uniform"):
+    # Unset parameters come from the tuning cache for this machine (see tuning.py)
+    params = tuning.resolve("mp", n_bodies, {"n_processes": multiprocessing.cpu_count(), "chunks_per_process": 1},
+                            n_processes=n_processes, chunks_per_process=chunks_per_process)
+    n_processes = params["n_processes"]
+    n_chunks = n_processes * params["chunks_per_process"]
         
-    # Initialize random planets
-    random.seed(42)
     planets = []
-    for _ in range(n_bodies):
-        planets.append(PlanetData(
-            x=random.uniform(-100, 100),
-            y=random.uniform(-100, 100),
-            z=random.uniform(-100, 100),
-            vx=random.uniform(-1, 1),
-            vy=random.uniform(-1, 1),
-            vz=random.uniform(-1, 1),
-            mass=random.uniform(1, 10)
-        ))
+    if scenario == "uniform":
+        # Initialize random planets
+        random.seed(42)
+        for _ in range(n_bodies):
+            planets.append(PlanetData(
+                x=random.uniform(-100, 100),
+                y=random.uniform(-100, 100),
+                z=random.uniform(-100, 100),
+                vx=random.uniform(-1, 1),
+                vy=random.uniform(-1, 1),
+                vz=random.uniform(-1, 1),
+                mass=random.uniform(1, 10)
+            ))
+    else:
+        # Clustered scenarios are generated with NumPy, imported only here so
+        # the uniform run needs nothing beyond the standard library
+        import scenarios
+        for row in scenarios.generate_rows(scenario, n_bodies):
+            planets.append(PlanetData(*row))
 
-    # Prepare chunks
-    chunk_size = (n_bodies + n_processes - 1) // n_processes
+    # Prepare chunks (more chunks than processes evens out the load)
+    chunk_size = (n_bodies + n_chunks - 1) // n_chunks
     ranges = []
-    for i in range(n_processes):
+    for i in range(n_chunks):
         start = i * chunk_size
         end = min((i + 1) * chunk_size, n_bodies)
         if start < end:
@@ -138,9 +150,17 @@ if __name__ == "__main__":
     parser.add_argument("--n", type=int, default=100, help="Number of bodies")
     parser.add_argument("--steps", type=int, default=100, help="Number of steps")
     parser.add_argument("--procs", type=int, default=None, help="Number of processes")
+    parser.add_argument("--chunks-per-proc", type=int, default=None, help="Row chunks per process")
+    parser.add_argument("--scenario", default="uniform", help="Initial conditions (see scenarios.py; non-uniform ones need NumPy)")
+    adaptive.add_arguments(parser)
     args = parser.parse_args()
 
-    print(f"Running MP N-body with N={args.n}, Steps={args.steps}, Procs={args.procs}")
-    duration = run_simulation(args.n, args.steps, n_processes=args.procs)
+    print(f"Running MP N-body with N={args.n}, Steps={adaptive.steps_label(args)}, Procs={args.procs}, Scenario={args.scenario}")
+    run = lambda steps: run_simulation(args.n, steps, n_processes=args.procs, chunks_per_process=args.chunks_per_proc,
+                                       scenario=args.scenario)
+    if args.adaptive:
+        adaptive.run_cli(args, run)
+        raise SystemExit(0)
+    duration = run(args.steps)
     print(f"Time: {duration:.4f} seconds")
     print(f"RESULT: {duration}")
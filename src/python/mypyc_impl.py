@@ -49,20 +49,26 @@ def update_positions(planets: List[Planet], dt: float) -> None:
         p.y += p.vy * dt
         p.z += p.vz * dt
 
-def run_simulation(n_bodies: int, n_steps: int, dt: float = 0.01) -> float:
+def run_simulation(n_bodies: int, n_steps: int, dt: float = 0.01, scenario: str = "uniform") -> float:
     planets: List[Planet] = []
-    # Initialize random planets
-    random.seed(42)
-    for _ in range(n_bodies):
-        planets.append(Planet(
-            x=random.uniform(-100, 100),
-            y=random.uniform(-100, 100),
-            z=random.uniform(-100, 100),
-            vx=random.uniform(-1, 1),
-            vy=random.uniform(-1, 1),
-            vz=random.uniform(-1, 1),
-            mass=random.uniform(1, 10)
-        ))
+    if scenario == "uniform":
+        # Initialize random planets
+        random.seed(42)
+        for _ in range(n_bodies):
+            planets.append(Planet(
+                x=random.uniform(-100, 100),
+                y=random.uniform(-100, 100),
+                z=random.uniform(-100, 100),
+                vx=random.uniform(-1, 1),
+                vy=random.uniform(-1, 1),
+                vz=random.uniform(-1, 1),
+                mass=random.uniform(1, 10)
+            ))
+    else:
+        # Clustered scenarios are generated with NumPy (see scenarios.py)
+        import scenarios
+        for row in scenarios.generate_rows(scenario, n_bodies):
+            planets.append(Planet(*row))
 
     start_time = time.time()
     
@@ -77,10 +83,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="MyPyc Python N-body benchmark")
     parser.add_argument("--n", type=int, default=100, help="Number of bodies")
     parser.add_argument("--steps", type=int, default=100, help="Number of steps")
+    parser.add_argument("--scenario", default="uniform", help="Initial conditions (see scenarios.py; non-uniform ones need NumPy)")
     args = parser.parse_args()
 
-    print(f"Running MyPyc Python N-body with N={args.n}, Steps={args.steps}")
-    duration = run_simulation(args.n, args.steps)
+    print(f"Running MyPyc Python N-body with N={args.n}, Steps={args.steps}, Scenario={args.scenario}")
+    duration = run_simulation(args.n, args.steps, scenario=args.scenario)
     print(f"Time: {duration:.4f} seconds")
     # Output for simple parsing
     print(f"RESULT: {duration}")
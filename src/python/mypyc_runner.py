@@ -7,6 +7,8 @@ import os
 import sys
 import subprocess
 import argparse
+import build_variants
+import adaptive
 
 def compile_mypyc():
     """Compile the mypyc implementation if needed"""
@@ -37,7 +39,24 @@ def main():
     parser = argparse.ArgumentParser(description="N-Body simulation with MyPyc")
     parser.add_argument("--n", type=int, default=100, help="Number of bodies")
     parser.add_argument("--steps", type=int, default=50, help="Number of simulation steps")
+    parser.add_argument("--scenario", default="uniform", help="Initial conditions (see scenarios.py)")
+    parser.add_argument("--variant", choices=build_variants.BACKEND_VARIANTS["mypyc"], default=None, help="Run a compiler-flag build variant (build it first with build_variants.py)")
+    adaptive.add_arguments(parser)
     args = parser.parse_args()
+
+    if args.variant is not None:
+        # Variants are never compiled here, so a run never includes a build
+        try:
+            module = build_variants.import_variant("mypyc", args.variant)
+        except ImportError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        if args.adaptive:
+            adaptive.run_cli(args, lambda steps: module.run_simulation(args.n, steps, scenario=args.scenario))
+            return
+        duration = module.run_simulation(args.n, args.steps, scenario=args.scenario)
+        print(f"RESULT: {duration}")
+        return
     
     # Compile if needed
     if not compile_mypyc():
@@ -45,7 +64,7 @@ def main():
         # Fall back to regular Python execution
         current_dir = os.path.dirname(os.path.abspath(__file__))
         result = subprocess.run([sys.executable, os.path.join(current_dir, "baseline.py"), 
-                       "--n", str(args.n), "--steps", str(args.steps)], 
+                       "--n", str(args.n), "--steps", str(args.steps), "--scenario", args.scenario] + adaptive.argv(args), 
                        capture_output=True, text=True)
         print(result.stdout)
         return
@@ -54,13 +73,16 @@ def main():
     try:
         import mypyc_impl
         # Call run_simulation directly from compiled module
-        duration = mypyc_impl.run_simulation(args.n, args.steps)
+        if args.adaptive:
+            adaptive.run_cli(args, lambda steps: mypyc_impl.run_simulation(args.n, steps, scenario=args.scenario))
+            return
+        duration = mypyc_impl.run_simulation(args.n, args.steps, scenario=args.scenario)
         print(f"RESULT: {duration}")
     except ImportError:
         print("Failed to import compiled module, falling back to regular Python")
         current_dir = os.path.dirname(os.path.abspath(__file__))
         result = subprocess.run([sys.executable, os.path.join(current_dir, "baseline.py"), 
-                       "--n", str(args.n), "--steps", str(args.steps)], 
+                       "--n", str(args.n), "--steps", str(args.steps), "--scenario", args.scenario] + adaptive.argv(args), 
                        capture_output=True, text=True)
         print(result.stdout)
 
@@ -0,0 +1,220 @@
+import argparse
+import importlib.util
+import json
+import math
+import os
+import time
+import numpy as np
+import tuning
+import scenarios
+
+# Library entry point that dispatches to the fastest available backend:
+#
+#   import nbody
+#   pos, vel = nbody.simulate(pos, vel, mass, steps=100, dt=0.01)
+#
+# Backends whose toolchain can be imported are ranked by the benchmark
+# results recorded on this machine (results store, results_*.json and the
+# tuning cache) at the closest N, scaled by (N / N_recorded)^2. Backends
+# without records keep a static order. If the chosen backend fails, the
+# next one is tried, ending with NumPy and then pure Python.
+#
+# Results are float64. JAX (default config) and CUDA Python compute in
+# float32, so they are only ranked with allow_float32=True.
+
+DEFAULT_ORDER = ["Numba (SoA)", "Numba", "JAX", "Taichi", "Cython", "C (ctypes)", "CUDA Python", "NumPy", "Vanilla Python"]
+
+# Tuning cache entries that correspond to a dispatchable method
+TUNED_METHODS = {"taichi-vector": "Taichi", "cuda-global": "CUDA Python"}
+
+def _run_numpy(pos, vel, mass, steps, dt, soft_epsilon):
+    import numpy_impl
+    numpy_impl.run_steps(pos, vel, mass[:, None], steps, dt, soft_epsilon)
+    return pos, vel
+
+def _run_numba(pos, vel, mass, steps, dt, soft_epsilon):
+    import numba_impl
+    numba_impl.run_steps(pos, vel, np.ascontiguousarray(mass[:, None]), steps, dt, soft_epsilon)
+    return pos, vel
+
+def _run_numba_soa(pos, vel, mass, steps, dt, soft_epsilon):
+    import numba_impl
+    x, y, z = (np.ascontiguousarray(pos[:, k]) for k in range(3))
+    vx, vy, vz = (np.ascontiguousarray(vel[:, k]) for k in range(3))
+    numba_impl.run_steps_soa(x, y, z, vx, vy, vz, mass, steps, dt, soft_epsilon)
+    return np.stack([x, y, z], axis=1), np.stack([vx, vy, vz], axis=1)
+
+def _run_cython(pos, vel, mass, steps, dt, soft_epsilon):
+    import cython_impl
+    cython_impl.run_steps(pos, vel, mass, steps, dt, soft_epsilon)
+    return pos, vel
+
+def _run_ctypes(pos, vel, mass, steps, dt, soft_epsilon):
+    # Raises (and falls back) if libnbody.so has not been built
+    import ctypes_impl
+    planets = ctypes_impl.pack(pos, vel, mass)
+    ctypes_impl.run_steps(planets, steps, dt, soft_epsilon)
+    new_pos, new_vel, _ = ctypes_impl.views(planets)
+    return new_pos.copy(), new_vel.copy()
+
+def _run_jax(pos, vel, mass, steps, dt, soft_epsilon):
+    # Float32 unless jax_enable_x64 is set
+    import jax_impl
+    new_pos, new_vel = jax_impl.run_steps(pos, vel, mass[:, None], steps, dt, soft_epsilon)
+    return np.asarray(new_pos, dtype=np.float64), np.asarray(new_vel, dtype=np.float64)
+
+def _run_taichi(pos, vel, mass, steps, dt, soft_epsilon):
+    import taichi_impl
+    sim = taichi_impl.NBodyTaichi(pos.shape[0], dt, soft_epsilon)
+    sim.pos.from_numpy(pos)
+    sim.vel.from_numpy(vel)
+    sim.mass.from_numpy(mass)
+    sim.run(steps)
+    return sim.pos.to_numpy(), sim.vel.to_numpy()
+
+def _run_cuda(pos, vel, mass, steps, dt, soft_epsilon):
+    # Single precision on the device
+    import cuda_impl
+    f32 = np.float32
+    new_pos, new_vel, _ = cuda_impl.simulate(pos.astype(f32), vel.astype(f32), mass[:, None].astype(f32),
+                                             steps, dt, soft_epsilon)
+    return new_pos.astype(np.float64), new_vel.astype(np.float64)
+
+def _run_baseline(pos, vel, mass, steps, dt, soft_epsilon):
+    import baseline
+    planets = [baseline.Planet(*p, *v, m) for p, v, m in zip(pos.tolist(), vel.tolist(), mass.tolist())]
+    for _ in range(steps):
+        baseline.compute_forces(planets, dt, soft_epsilon)
+        baseline.update_positions(planets, dt)
+    return (np.array([[p.x, p.y, p.z] for p in planets]),
+            np.array([[p.vx, p.vy, p.vz] for p in planets]))
+
+# method name (as recorded by bench_runner) -> (modules it needs, runner, precision it computes in)
+BACKENDS = {
+    "Numba (SoA)": (("numba",), _run_numba_soa, "float64"),
+    "Numba": (("numba",), _run_numba, "float64"),
+    "JAX": (("jax",), _run_jax, "float32"),
+    "Taichi": (("taichi",), _run_taichi, "float64"),
+    "Cython": (("cython_impl",), _run_cython, "float64"),
+    "C (ctypes)": (("ctypes",), _run_ctypes, "float64"),
+    "CUDA Python": (("numba",), _run_cuda, "float32"),
+    "NumPy": ((), _run_numpy, "float64"),
+    "Vanilla Python": ((), _run_baseline, "float64"),
+}
+
+def available_backends(allow_float32=False):
+    """Methods whose modules can be imported here (without importing them)."""
+    found = []
+    for method, (modules, _, precision) in BACKENDS.items():
+        if precision == "float32" and not allow_float32:
+            continue
+        if all(importlib.util.find_spec(m) is not None for m in modules):
+            found.append(method)
+    return found
+
+def _recorded_samples():
+    # (method, n, seconds per step) recorded on this machine
+    processor = tuning.host_key()
+    samples = []
+
+    db_path = os.path.join(tuning.REPO_ROOT, "results", "results.db")
+    results_dir = os.path.join(tuning.REPO_ROOT, "results")
+    if os.path.exists(db_path):
+        from results_store import ResultsStore
+        with ResultsStore(db_path) as store:
+            for row in store.query(method=list(BACKENDS), processor=processor):
+                samples.append((row["method"], row["n"], row["time"] / row["steps"]))
+    elif os.path.isdir(results_dir):
+        for filename in os.listdir(results_dir):
+            if not (filename.startswith("results_") and filename.endswith(".json")):
+                continue
+            with open(os.path.join(results_dir, filename), "r") as f:
+                data = json.load(f)
+            if data.get("system", {}).get("processor") != processor:
+                continue
+            for b in data.get("benchmarks", []):
+                if b["method"] in BACKENDS:
+                    samples.append((b["method"], b["n"], b["time"] / b["steps"]))
+
+    tuned = tuning.load_cache().get(processor, {})
+    for backend, method in TUNED_METHODS.items():
+        for entry in tuned.get(backend, []):
+            samples.append((method, entry["n"], entry["time_per_step"]))
+    return samples
+
+def predict(n_bodies, samples=None):
+    """Predicted seconds per step for each method with records on this machine."""
+    if samples is None:
+        samples = _recorded_samples()
+    by_method = {}
+    for method, n, per_step in samples:
+        by_method.setdefault(method, {}).setdefault(n, []).append(per_step)
+
+    predictions = {}
+    for method, by_n in by_method.items():
+        # Closest recorded N on a log scale, scaled by the O(N^2) work ratio
+        n_rec = min(by_n, key=lambda n: abs(math.log(n) - math.log(max(n_bodies, 1))))
+        times = sorted(by_n[n_rec])
+        predictions[method] = times[len(times) // 2] * (n_bodies / n_rec) ** 2
+    return predictions
+
+def choose_backends(n_bodies, allow_float32=False):
+    """Available methods, predicted-fastest first."""
+    available = available_backends(allow_float32)
+    try:
+        predictions = predict(n_bodies)
+    except (OSError, ValueError, ImportError):
+        predictions = {}
+    ranked = sorted((m for m in available if m in predictions), key=predictions.get)
+    unranked = [m for m in DEFAULT_ORDER if m in available and m not in predictions]
+    return ranked + unranked
+
+def simulate(pos, vel, mass, steps, dt=0.01, soft_epsilon=1e-9, backend=None, allow_float32=False, verbose=False):
+    """Advance the bodies `steps` steps on the fastest available backend.
+
+    pos and vel are (N, 3) arrays and mass is (N,) or (N, 1); the inputs are
+    not modified. Returns (pos, vel) as float64 NumPy arrays, computed in
+    float64 unless allow_float32 lets the float32 backends (JAX, CUDA Python)
+    be chosen. Pass `backend` (a method name such as "Numba") to skip the
+    selection; it runs in that backend's precision.
+    """
+    pos = np.array(pos, dtype=np.float64, order="C")
+    vel = np.array(vel, dtype=np.float64, order="C")
+    mass = np.array(mass, dtype=np.float64).reshape(-1)
+
+    candidates = [backend] if backend is not None else choose_backends(pos.shape[0], allow_float32)
+    for method in candidates:
+        _, runner, _ = BACKENDS[method]
+        try:
+            start = time.time()
+            # Every attempt gets fresh copies so a failed backend leaves no trace
+            result = runner(pos.copy(), vel.copy(), mass.copy(), steps, dt, soft_epsilon)
+        except Exception as e:
+            if backend is not None:
+                raise
+            if verbose:
+                print(f"{method} failed ({e}), falling back")
+            continue
+        if verbose:
+            print(f"Ran {steps} steps with {method} in {time.time() - start:.4f} seconds")
+        return result
+    raise RuntimeError("No N-body backend could run")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Auto-dispatched N-body simulation")
+    parser.add_argument("--n", type=int, default=100, help="Number of bodies")
+    parser.add_argument("--steps", type=int, default=100, help="Number of steps")
+    parser.add_argument("--backend", choices=list(BACKENDS), default=None, help="Force a backend")
+    parser.add_argument("--allow-float32", action="store_true", help="Also rank the float32 backends (JAX, CUDA Python)")
+    scenarios.add_argument(parser)
+    args = parser.parse_args()
+
+    print(f"Backend ranking for N={args.n}: {', '.join(choose_backends(args.n, args.allow_float32))}")
+
+    pos, vel, mass = scenarios.generate(args.scenario, args.n)
+
+    start_time = time.time()
+    simulate(pos, vel, mass, args.steps, backend=args.backend, allow_float32=args.allow_float32, verbose=True)
+    duration = time.time() - start_time
+    print(f"Time: {duration:.4f} seconds")
+    print(f"RESULT: {duration}")
@@ -1,7 +1,16 @@
 import argparse
 import time
+import math
+import re
+import os
+import sys
+import shutil
+import subprocess
 import numpy as np
 from numba import njit, prange
+from morton import MortonOrder
+import scenarios
+import adaptive
 
 @njit(parallel=True)
 def compute_forces_numba(pos, mass, dt, soft_epsilon):
@@ -98,28 +107,389 @@ def run_steps(pos, vel, mass, n_steps, dt, soft_epsilon):
             pos[i, 1] += vel[i, 1] * dt
             pos[i, 2] += vel[i, 2] * dt
 
-def run_simulation(n_bodies, n_steps, dt=0.01, soft_epsilon=1e-9):
-    np.random.seed(42)
-    pos = np.random.uniform(-100, 100, (n_bodies, 3))
-    vel = np.random.uniform(-1, 1, (n_bodies, 3))
-    mass = np.random.uniform(1, 10, (n_bodies, 1))
+@njit(parallel=True, fastmath=True)
+def run_steps_soa(x, y, z, vx, vy, vz, m, n_steps, dt, soft_epsilon):
+    # Same integrator as run_steps, but on separate contiguous x/y/z/m arrays
+    # so the j-loop is unit-stride. There is no i == j branch: the self term
+    # has dx = dy = dz = 0 and contributes nothing, and a branch-free body
+    # lets LLVM vectorize the reduction (fastmath permits reassociation).
+    # That needs soft_epsilon > 0: at 0 the self term is 0 * inf = nan.
+    n = x.shape[0]
+    for _ in range(n_steps):
+        for i in prange(n):
+            fx = 0.0
+            fy = 0.0
+            fz = 0.0
+            x1 = x[i]
+            y1 = y[i]
+            z1 = z[i]
+
+            for j in range(n):
+                dx = x[j] - x1
+                dy = y[j] - y1
+                dz = z[j] - z1
+
+                dist_sq = dx*dx + dy*dy + dz*dz + soft_epsilon
+                # One reciprocal square root per pair: m_j / r^3 = m_j * (1/r)^3
+                inv = 1.0 / math.sqrt(dist_sq)
+                f = m[j] * (inv * inv * inv)
+
+                fx += f * dx
+                fy += f * dy
+                fz += f * dz
+
+            vx[i] += fx * dt
+            vy[i] += fy * dt
+            vz[i] += fz * dt
+
+        for i in prange(n):
+            x[i] += vx[i] * dt
+            y[i] += vy[i] * dt
+            z[i] += vz[i] * dt
+
+DIAG_COLUMNS = scenarios.DIAG_COLUMNS
+
+def n_diag_records(n_steps, every):
+    return (n_steps + every - 1) // every
+
+@njit(parallel=True)
+def run_steps_diagnostics(pos, vel, mass, n_steps, dt, soft_epsilon, every, phi, records):
+    # run_steps with diagnostics fused into the force pass. On every
+    # `every`-th step (starting with the first) the j-loop also accumulates
+    # the per-body potential phi_i = -sum_j m_j / r_ij into phi, and energy,
+    # momentum and virial sum_i m_i r_i . a_i of the state at the start of
+    # the step are reduced across the prange into records.
+    n = pos.shape[0]
+    rec = 0
+    for step in range(n_steps):
+        diag = step % every == 0
+        kinetic = 0.0
+        potential = 0.0
+        px = 0.0
+        py = 0.0
+        pz = 0.0
+        virial = 0.0
+
+        for i in prange(n):
+            fx = 0.0
+            fy = 0.0
+            fz = 0.0
+            pot = 0.0
+            x1 = pos[i, 0]
+            y1 = pos[i, 1]
+            z1 = pos[i, 2]
+
+            for j in range(n):
+                if i == j:
+                   continue
+
+                dx = pos[j, 0] - x1
+                dy = pos[j, 1] - y1
+                dz = pos[j, 2] - z1
+
+                dist_sq = dx*dx + dy*dy + dz*dz + soft_epsilon
+                dist = dist_sq**0.5
+
+                f = mass[j, 0] / (dist_sq * dist)
+                # Loop-invariant branch, hoisted out of the j-loop by LLVM
+                if diag:
+                    pot -= mass[j, 0] / dist
+
+                fx += f * dx
+                fy += f * dy
+                fz += f * dz
+
+            mi = mass[i, 0]
+            if diag:
+                phi[i] = pot
+                kinetic += 0.5 * mi * (vel[i, 0]*vel[i, 0] + vel[i, 1]*vel[i, 1] + vel[i, 2]*vel[i, 2])
+                potential += 0.5 * mi * pot
+                px += mi * vel[i, 0]
+                py += mi * vel[i, 1]
+                pz += mi * vel[i, 2]
+                virial += mi * (x1 * fx + y1 * fy + z1 * fz)
+
+            vel[i, 0] += fx * dt
+            vel[i, 1] += fy * dt
+            vel[i, 2] += fz * dt
+
+        if diag:
+            records[rec, 0] = step
+            records[rec, 1] = kinetic
+            records[rec, 2] = potential
+            records[rec, 3] = px
+            records[rec, 4] = py
+            records[rec, 5] = pz
+            records[rec, 6] = virial
+            rec += 1
+
+        # Update positions
+        for i in prange(n):
+            pos[i, 0] += vel[i, 0] * dt
+            pos[i, 1] += vel[i, 1] * dt
+            pos[i, 2] += vel[i, 2] * dt
+
+@njit(parallel=True, fastmath=True)
+def tile_moments(pos, mass, tile, com, tile_mass, radius):
+    # Centre of mass, total mass and bounding radius of each tile of `tile`
+    # consecutive bodies
+    n = pos.shape[0]
+    for t in prange(com.shape[0]):
+        j_start = t * tile
+        j_end = min(j_start + tile, n)
+        m = 0.0
+        cx = 0.0
+        cy = 0.0
+        cz = 0.0
+        for j in range(j_start, j_end):
+            m += mass[j, 0]
+            cx += mass[j, 0] * pos[j, 0]
+            cy += mass[j, 0] * pos[j, 1]
+            cz += mass[j, 0] * pos[j, 2]
+        cx /= m
+        cy /= m
+        cz /= m
+        r_sq = 0.0
+        for j in range(j_start, j_end):
+            dx = pos[j, 0] - cx
+            dy = pos[j, 1] - cy
+            dz = pos[j, 2] - cz
+            r_sq = max(r_sq, dx*dx + dy*dy + dz*dz)
+        com[t, 0] = cx
+        com[t, 1] = cy
+        com[t, 2] = cz
+        tile_mass[t] = m
+        radius[t] = r_sq**0.5
+
+@njit(parallel=True, fastmath=True)
+def run_steps_tiled(pos, vel, mass, n_steps, dt, soft_epsilon, tile=64, theta=0.5):
+    # Approximate, not an exact direct sum: a tile whose bounding radius is
+    # below theta times its distance from body i is replaced by its monopole
+    # (centre of mass), otherwise its bodies are summed exactly, so the error
+    # grows with theta (theta = 0 is exact). Tiles are compact, and the
+    # early-out fires often, only when consecutive bodies are close in space,
+    # i.e. after Morton sorting. theta < 1 keeps a body's own tile exact.
+    n = pos.shape[0]
+    n_tiles = (n + tile - 1) // tile
+    com = np.empty((n_tiles, 3))
+    tile_mass = np.empty(n_tiles)
+    radius = np.empty(n_tiles)
+    theta_sq = theta * theta
+
+    for _ in range(n_steps):
+        tile_moments(pos, mass, tile, com, tile_mass, radius)
+
+        for i in prange(n):
+            fx = 0.0
+            fy = 0.0
+            fz = 0.0
+            x1 = pos[i, 0]
+            y1 = pos[i, 1]
+            z1 = pos[i, 2]
+
+            for t in range(n_tiles):
+                dx = com[t, 0] - x1
+                dy = com[t, 1] - y1
+                dz = com[t, 2] - z1
+                d_sq = dx*dx + dy*dy + dz*dz
+
+                if radius[t] * radius[t] < theta_sq * d_sq:
+                    dist_sq = d_sq + soft_epsilon
+                    f = tile_mass[t] / (dist_sq * math.sqrt(dist_sq))
+                    fx += f * dx
+                    fy += f * dy
+                    fz += f * dz
+                else:
+                    j_end = min(t * tile + tile, n)
+                    for j in range(t * tile, j_end):
+                        if i == j:
+                            continue
+                        dx = pos[j, 0] - x1
+                        dy = pos[j, 1] - y1
+                        dz = pos[j, 2] - z1
+                        dist_sq = dx*dx + dy*dy + dz*dz + soft_epsilon
+                        f = mass[j, 0] / (dist_sq * math.sqrt(dist_sq))
+                        fx += f * dx
+                        fy += f * dy
+                        fz += f * dz
+
+            vel[i, 0] += fx * dt
+            vel[i, 1] += fy * dt
+            vel[i, 2] += fz * dt
+
+        for i in prange(n):
+            pos[i, 0] += vel[i, 0] * dt
+            pos[i, 1] += vel[i, 1] * dt
+            pos[i, 2] += vel[i, 2] * dt
+
+def is_vectorized(func):
+    # Look for packed double operations in the LLVM IR of every compiled signature
+    pattern = re.compile(r"<\d+ x double>")
+    return any(pattern.search(ir) for ir in func.inspect_llvm().values())
+
+def run_simulation(n_bodies, n_steps, dt=0.01, soft_epsilon=1e-9, kernel="aos", diag_every=None,
+                   sort_every=None, tile=64, theta=0.5, scenario="uniform"):
+    pos, vel, mass = scenarios.generate(scenario, n_bodies)
     
+    if diag_every is not None:
+        return run_simulation_diagnostics(pos, vel, mass, n_steps, dt, soft_epsilon, diag_every)[0]
+
+    if sort_every is not None:
+        if kernel == "soa":
+            raise ValueError("Morton sorting is supported for the aos and tiled kernels")
+        return run_simulation_sorted(pos, vel, mass, n_steps, dt, soft_epsilon, kernel, sort_every, tile, theta)[0]
+
+    if kernel == "tiled":
+        args = (pos, vel, mass)
+        step_fn = lambda *a: run_steps_tiled(*a, tile, theta)
+    elif kernel == "soa":
+        x, y, z = (np.ascontiguousarray(pos[:, k]) for k in range(3))
+        vx, vy, vz = (np.ascontiguousarray(vel[:, k]) for k in range(3))
+        m = np.ascontiguousarray(mass[:, 0])
+        args = (x, y, z, vx, vy, vz, m)
+        step_fn = run_steps_soa
+    else:
+        args = (pos, vel, mass)
+        step_fn = run_steps
+
     # Warmup compilation
-    run_steps(pos, vel, mass, 1, dt, soft_epsilon)
+    step_fn(*args, 1, dt, soft_epsilon)
     
     start_time = time.time()
-    run_steps(pos, vel, mass, n_steps, dt, soft_epsilon)
+    step_fn(*args, n_steps, dt, soft_epsilon)
     end_time = time.time()
     
     return end_time - start_time
 
+def run_simulation_sorted(pos, vel, mass, n_steps, dt, soft_epsilon, kernel, sort_every, tile=64, theta=0.5):
+    """Run in chunks of sort_every steps, Morton-reordering pos/vel/mass in place
+    before each chunk (the reorders are timed too).
+
+    Returns (elapsed, pos, vel) with pos and vel back in the original body order.
+    """
+    if kernel == "tiled":
+        step_fn = lambda p, v, m, k: run_steps_tiled(p, v, m, k, dt, soft_epsilon, tile, theta)
+    else:
+        step_fn = lambda p, v, m, k: run_steps(p, v, m, k, dt, soft_epsilon)
+    order = MortonOrder(pos.shape[0])
+
+    # Warmup compilation on copies
+    step_fn(pos.copy(), vel.copy(), mass.copy(), 1)
+
+    start_time = time.time()
+    done = 0
+    while done < n_steps:
+        order.reorder(pos, vel, mass)
+        chunk = min(sort_every, n_steps - done)
+        step_fn(pos, vel, mass, chunk)
+        done += chunk
+    end_time = time.time()
+
+    return end_time - start_time, order.to_original(pos), order.to_original(vel)
+
+def perf_cache_misses(argv):
+    """(cache-misses, cache-references) of a child run of this script under
+    `perf stat`, or None when perf is unavailable."""
+    if not shutil.which("perf"):
+        return None
+    cmd = ["perf", "stat", "-x", ",", "-e", "cache-misses,cache-references", sys.executable, os.path.abspath(__file__)] + argv
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    counts = {}
+    for line in result.stderr.splitlines():
+        fields = line.split(",")
+        if len(fields) > 2 and fields[0].isdigit():
+            counts[fields[2]] = int(fields[0])
+    if "cache-misses" not in counts:
+        return None
+    return counts["cache-misses"], counts.get("cache-references", 0)
+
+def run_simulation_diagnostics(pos, vel, mass, n_steps, dt, soft_epsilon, every):
+    """Time run_steps_diagnostics. Returns (elapsed, records, phi)."""
+    phi = np.zeros(pos.shape[0])
+    records = np.zeros((n_diag_records(n_steps, every), len(DIAG_COLUMNS)))
+
+    # Warmup compilation on copies so the timed run starts from the same state
+    run_steps_diagnostics(pos.copy(), vel.copy(), mass, 1, dt, soft_epsilon, every, phi, np.zeros((1, len(DIAG_COLUMNS))))
+
+    start_time = time.time()
+    run_steps_diagnostics(pos, vel, mass, n_steps, dt, soft_epsilon, every, phi, records)
+    end_time = time.time()
+
+    return end_time - start_time, records, phi
+
+def iter_simulation(n_bodies, n_steps, every=10, dt=0.01, soft_epsilon=1e-9, scenario="uniform"):
+    """Yield (step, pos, vel) after every `every` steps (and after the last step).
+
+    Each chunk of steps is one call into the compiled run_steps. pos and vel
+    are read-only views of the live state, valid until the generator resumes.
+    """
+    pos, vel, mass = scenarios.generate(scenario, n_bodies)
+
+    pos_view = pos.view()
+    vel_view = vel.view()
+    pos_view.flags.writeable = False
+    vel_view.flags.writeable = False
+
+    done = 0
+    while done < n_steps:
+        chunk = min(every, n_steps - done)
+        run_steps(pos, vel, mass, chunk, dt, soft_epsilon)
+        done += chunk
+        yield done, pos_view, vel_view
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Numba N-body benchmark")
     parser.add_argument("--n", type=int, default=100, help="Number of bodies")
     parser.add_argument("--steps", type=int, default=100, help="Number of steps")
+    parser.add_argument("--kernel", choices=["aos", "soa", "tiled"], default="aos", help="aos = original (N, 3) kernel, soa = contiguous x/y/z fastmath kernel, tiled = direct sum with far tiles approximated by their centre of mass")
+    parser.add_argument("--compare", action="store_true", help="Also time the other kernel and report SoA speedup and vectorization")
+    parser.add_argument("--diag-every", type=int, default=None, help="Fuse energy/momentum/virial diagnostics into every K-th step and report the overhead")
+    parser.add_argument("--sort-every", type=int, default=None, help="Morton-sort the bodies every K steps (aos and tiled kernels)")
+    parser.add_argument("--tile", type=int, default=64, help="Tile size for the tiled kernel")
+    parser.add_argument("--theta", type=float, default=0.5, help="Opening criterion for the tiled kernel (radius < theta * distance)")
+    parser.add_argument("--compare-sort", action="store_true", help="Time the kernel with and without Morton sorting (and count cache misses if perf is available)")
+    scenarios.add_argument(parser)
+    adaptive.add_arguments(parser)
     args = parser.parse_args()
 
-    print(f"Running Numba N-body with N={args.n}, Steps={args.steps}")
-    duration = run_simulation(args.n, args.steps)
+    if args.compare_sort:
+        sort_every = args.sort_every or 10
+        print(f"Running Numba N-body with N={args.n}, Steps={args.steps}, Kernel={args.kernel}, Scenario={args.scenario}, Morton sort every {sort_every} steps vs unsorted")
+        base_argv = ["--n", str(args.n), "--steps", str(args.steps), "--kernel", args.kernel, "--tile", str(args.tile),
+                     "--theta", str(args.theta), "--scenario", args.scenario]
+        for label, sort in (("unsorted", None), ("sorted", sort_every)):
+            duration = run_simulation(args.n, args.steps, kernel=args.kernel, sort_every=sort, tile=args.tile, theta=args.theta,
+                                      scenario=args.scenario)
+            line = f"{label:>9}: {duration / args.steps * 1e3:.3f} ms/step"
+            counts = perf_cache_misses(base_argv + (["--sort-every", str(sort)] if sort else []))
+            if counts is not None:
+                misses, refs = counts
+                line += f", {misses} cache misses ({100 * misses / max(refs, 1):.1f}% of references, whole process)"
+            print(line)
+        raise SystemExit(0)
+
+    if args.diag_every is not None:
+        print(f"Running Numba N-body with N={args.n}, Steps={args.steps}, Scenario={args.scenario}, Diagnostics every {args.diag_every} steps")
+        plain = run_simulation(args.n, args.steps, scenario=args.scenario)
+        pos, vel, mass = scenarios.generate(args.scenario, args.n)
+        duration, records, _ = run_simulation_diagnostics(pos, vel, mass, args.steps, 0.01, 1e-9, args.diag_every)
+        scenarios.report_diagnostics(records, plain, duration)
+        print(f"RESULT: {duration}")
+        raise SystemExit(0)
+
+    print(f"Running Numba N-body with N={args.n}, Steps={adaptive.steps_label(args)}, Kernel={args.kernel}, Scenario={args.scenario}")
+    run = lambda steps: run_simulation(args.n, steps, kernel=args.kernel, sort_every=args.sort_every, tile=args.tile, theta=args.theta,
+                                       scenario=args.scenario)
+    if args.adaptive:
+        adaptive.run_cli(args, run)
+        raise SystemExit(0)
+    duration = run(args.steps)
     print(f"Time: {duration:.4f} seconds")
+    if args.compare and args.kernel != "tiled":
+        other = "soa" if args.kernel == "aos" else "aos"
+        other_duration = run_simulation(args.n, args.steps, kernel=other, scenario=args.scenario)
+        aos_time, soa_time = (duration, other_duration) if args.kernel == "aos" else (other_duration, duration)
+        print(f"AoS kernel: {aos_time:.4f} seconds (vectorized: {is_vectorized(run_steps)})")
+        print(f"SoA kernel: {soa_time:.4f} seconds (vectorized: {is_vectorized(run_steps_soa)})")
+        print(f"SoA speedup: {aos_time / soa_time:.2f}x")
     print(f"RESULT: {duration}")
@@ -1,16 +1,19 @@
 import argparse
 import time
 import numpy as np
+import scenarios
+import adaptive
 
-def run_simulation(n_bodies, n_steps, dt=0.01, soft_epsilon=1e-9):
-    # Initialize bodies
-    np.random.seed(42)
-    pos = np.random.uniform(-100, 100, (n_bodies, 3))
-    vel = np.random.uniform(-1, 1, (n_bodies, 3))
-    mass = np.random.uniform(1, 10, (n_bodies, 1))
-    
-    start_time = time.time()
-    
+def init_bodies(n_bodies, scenario="uniform"):
+    return scenarios.generate(scenario, n_bodies)
+
+def read_only(arr):
+    view = arr.view()
+    view.flags.writeable = False
+    return view
+
+def run_steps(pos, vel, mass, n_steps, dt=0.01, soft_epsilon=1e-9):
+    # Advances pos and vel in place
     for _ in range(n_steps):
         # Compute forces using broadcasting
         # pos is (N, 3)
@@ -56,17 +59,117 @@ def run_simulation(n_bodies, n_steps, dt=0.01, soft_epsilon=1e-9):
         
         # Update position
         pos += vel * dt
-        
+
+def gemm_accelerations(pos, mass, soft_epsilon=1e-9, tile=1024):
+    """Accelerations via matrix products, `tile` rows of i at a time.
+
+    |p_j - p_i|^2 = |p_i|^2 + |p_j|^2 - 2 p_i.p_j, so the distance matrix comes
+    from one (tile, 3) x (3, N) GEMM, and sum_j W_ij (p_j - p_i) =
+    (W @ p)_i - rowsum(W)_i p_i from a second one. Both expansions subtract
+    large nearly equal terms, so coordinates are centred on each tile's mean
+    first, the squared distances are clamped at zero and the self term
+    (whose weight m_i / eps^1.5 would swamp the row) is zeroed.
+    """
+    n = pos.shape[0]
+    acc = np.empty_like(pos)
+    mass_row = mass.T  # (1, N)
+    for start in range(0, n, tile):
+        end = min(start + tile, n)
+        centre = pos[start:end].mean(axis=0)
+        b = pos - centre
+        a = b[start:end]
+        sq_b = np.einsum("ij,ij->i", b, b)
+
+        dist_sq = a @ b.T  # (tile, N)
+        dist_sq *= -2.0
+        dist_sq += sq_b[start:end, None]
+        dist_sq += sq_b[None, :]
+        np.maximum(dist_sq, 0.0, out=dist_sq)
+        dist_sq += soft_epsilon
+
+        # W_ij = m_j / dist^3, built in place
+        w = np.sqrt(dist_sq)
+        w *= dist_sq
+        np.divide(mass_row, w, out=w)
+        rows = np.arange(end - start)
+        w[rows, rows + start] = 0.0
+
+        acc[start:end] = w @ b - w.sum(axis=1)[:, None] * a
+    return acc
+
+def run_steps_gemm(pos, vel, mass, n_steps, dt=0.01, soft_epsilon=1e-9, tile=1024):
+    # Same update as run_steps, with the pairwise work done by BLAS
+    for _ in range(n_steps):
+        acc = gemm_accelerations(pos, mass, soft_epsilon, tile)
+        vel += acc * dt
+        pos += vel * dt
+
+def run_simulation(n_bodies, n_steps, dt=0.01, soft_epsilon=1e-9, kernel="broadcast", tile=1024, scenario="uniform"):
+    # Initialize bodies
+    pos, vel, mass = init_bodies(n_bodies, scenario)
+    
+    start_time = time.time()
+    if kernel == "gemm":
+        run_steps_gemm(pos, vel, mass, n_steps, dt, soft_epsilon, tile)
+    else:
+        run_steps(pos, vel, mass, n_steps, dt, soft_epsilon)
     end_time = time.time()
     return end_time - start_time
 
+def compare_kernels(n_values, n_steps, tile=1024, scenario="uniform"):
+    """Per-step time of both kernels and the relative error of the GEMM accelerations."""
+    rows = []
+    for n in n_values:
+        pos, _, mass = init_bodies(n, scenario)
+        # One broadcast step gives the reference accelerations
+        ref_vel = np.zeros_like(pos)
+        run_steps(pos.copy(), ref_vel, mass, 1, dt=1.0)
+        acc = gemm_accelerations(pos, mass, tile=tile)
+        error = np.abs(acc - ref_vel).max() / np.abs(ref_vel).max()
+
+        broadcast = run_simulation(n, n_steps, scenario=scenario) / n_steps
+        gemm = run_simulation(n, n_steps, kernel="gemm", tile=tile, scenario=scenario) / n_steps
+        rows.append((n, broadcast, gemm, error))
+    return rows
+
+def iter_simulation(n_bodies, n_steps, every=10, dt=0.01, soft_epsilon=1e-9, scenario="uniform"):
+    """Yield (step, pos, vel) after every `every` steps (and after the last step).
+
+    pos and vel are read-only views of the live state: they are only valid
+    until the generator is resumed, so copy them to keep a snapshot.
+    """
+    pos, vel, mass = init_bodies(n_bodies, scenario)
+    pos_view, vel_view = read_only(pos), read_only(vel)
+    done = 0
+    while done < n_steps:
+        chunk = min(every, n_steps - done)
+        run_steps(pos, vel, mass, chunk, dt, soft_epsilon)
+        done += chunk
+        yield done, pos_view, vel_view
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="NumPy N-body benchmark")
     parser.add_argument("--n", type=int, default=100, help="Number of bodies")
     parser.add_argument("--steps", type=int, default=100, help="Number of steps")
+    parser.add_argument("--kernel", choices=["broadcast", "gemm"], default="broadcast", help="broadcast = (N, N, 3) differences, gemm = distance and force sums from BLAS matrix products")
+    parser.add_argument("--tile", type=int, default=1024, help="Rows per GEMM tile (bounds memory at tile * N doubles)")
+    parser.add_argument("--compare", type=int, nargs="*", default=None, metavar="N", help="Time both kernels at these N (default: --n) and report the speedup")
+    scenarios.add_argument(parser)
+    adaptive.add_arguments(parser)
     args = parser.parse_args()
 
-    print(f"Running NumPy N-body with N={args.n}, Steps={args.steps}")
-    duration = run_simulation(args.n, args.steps)
+    if args.compare is not None:
+        print(f"Broadcast vs GEMM kernel, Steps={args.steps}, Tile={args.tile}, Scenario={args.scenario}")
+        for n, broadcast, gemm, error in compare_kernels(args.compare or [args.n], args.steps, args.tile, args.scenario):
+            print(f"N={n:>6}: broadcast {broadcast * 1e3:9.3f} ms/step, gemm {gemm * 1e3:9.3f} ms/step, "
+                  f"speedup {broadcast / gemm:5.2f}x, max rel. acc error {error:.1e}")
+        raise SystemExit(0)
+
+    print(f"Running NumPy N-body with N={args.n}, Steps={adaptive.steps_label(args)}, Kernel={args.kernel}, Scenario={args.scenario}")
+    run = lambda steps: run_simulation(args.n, steps, kernel=args.kernel, tile=args.tile, scenario=args.scenario)
+    if args.adaptive:
+        adaptive.run_cli(args, run)
+        raise SystemExit(0)
+    duration = run(args.steps)
     print(f"Time: {duration:.4f} seconds")
     print(f"RESULT: {duration}")
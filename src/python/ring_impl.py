@@ -0,0 +1,323 @@
+import argparse
+import socket
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import scenarios
+import adaptive
+
+try:
+    from mpi4py import MPI
+except ImportError:
+    MPI = None
+
+# Ring decomposition across ranks (processes, possibly on different nodes).
+#
+# - Each rank owns a contiguous block of ceil(N / P) bodies, padded with
+#   zero-mass bodies so that every block has the same shape.
+# - A block is packed as (B, 4) rows of [x, y, z, m].
+# - Each step, position blocks travel P - 1 hops around the ring. While a
+#   rank computes its own bodies' forces against the block it holds, the
+#   next block is already being sent/received in the background, so
+#   communication overlaps with compute.
+#
+# Transport is mpi4py (non-blocking Isend/Irecv) when run under mpiexec,
+# otherwise plain TCP sockets between neighbours.
+
+class MPIRing:
+    def __init__(self, comm):
+        self.comm = comm
+        self.rank = comm.Get_rank()
+        self.size = comm.Get_size()
+        self.right = (self.rank + 1) % self.size
+        self.left = (self.rank - 1) % self.size
+
+    def shift(self, send_buf, recv_buf):
+        # Send to the right neighbour, receive from the left one
+        reqs = [
+            self.comm.Irecv(recv_buf, source=self.left, tag=0),
+            self.comm.Isend(send_buf, dest=self.right, tag=0),
+        ]
+        return _MPIHandle(reqs)
+
+    def gather(self, obj):
+        return self.comm.gather(obj, root=0)
+
+    def close(self):
+        pass
+
+class _MPIHandle:
+    def __init__(self, reqs):
+        self.reqs = reqs
+
+    def wait(self):
+        MPI.Request.Waitall(self.reqs)
+
+class SocketRing:
+    """TCP ring: one connection to the right neighbour, one from the left.
+
+    addresses[r] is the (host, port) rank r listens on. Pass an already bound
+    and listening `listener` to use it instead of binding addresses[rank].
+    """
+
+    def __init__(self, rank, size, addresses, connect_timeout=60.0, listener=None):
+        self.rank = rank
+        self.size = size
+        self.pool = ThreadPoolExecutor(max_workers=2)
+        self.to_right = None
+        self.from_left = None
+        if size == 1:
+            if listener is not None:
+                listener.close()
+            return
+
+        if listener is None:
+            host, port = addresses[rank]
+            listener = _listen("" if host not in ("127.0.0.1", "localhost") else host, port)
+
+        # Connect to the right neighbour, retrying until it is listening
+        right_addr = addresses[(rank + 1) % size]
+        deadline = time.time() + connect_timeout
+        while True:
+            try:
+                self.to_right = socket.create_connection(right_addr)
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.05)
+
+        self.from_left, _ = listener.accept()
+        listener.close()
+        for sock in (self.to_right, self.from_left):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _recv_into(self, buf):
+        view = memoryview(buf).cast("B")
+        received = 0
+        while received < len(view):
+            nbytes = self.from_left.recv_into(view[received:])
+            if nbytes == 0:
+                raise ConnectionError("Left neighbour closed the connection")
+            received += nbytes
+
+    def shift(self, send_buf, recv_buf):
+        futures = [
+            self.pool.submit(self.to_right.sendall, memoryview(send_buf).cast("B")),
+            self.pool.submit(self._recv_into, recv_buf),
+        ]
+        return _FutureHandle(futures)
+
+    def gather(self, obj):
+        # Stats are collected by the local launcher instead
+        return [obj]
+
+    def close(self):
+        for sock in (self.to_right, self.from_left):
+            if sock is not None:
+                sock.close()
+        self.pool.shutdown()
+
+class _FutureHandle:
+    def __init__(self, futures):
+        self.futures = futures
+
+    def wait(self):
+        for fut in self.futures:
+            fut.result()
+
+def uniform_block(start, end, seed=42):
+    """Bodies start..end of a uniform system (the uniform scenario's
+    distributions), generated without the other bodies: body i takes the
+    eight doubles at Philox counter 2 * i (seven are used), so every rank
+    draws exactly its own rows, whatever the number of ranks."""
+    bit_gen = np.random.Philox(key=seed)
+    bit_gen.advance(2 * start)
+    u = np.random.Generator(bit_gen).random((end - start, 8))
+    return 200.0 * u[:, 0:3] - 100.0, 2.0 * u[:, 3:6] - 1.0, 1.0 + 9.0 * u[:, 6:7]
+
+def init_block(n_bodies, rank, size, scenario="uniform"):
+    block_size = (n_bodies + size - 1) // size
+    start = min(rank * block_size, n_bodies)
+    end = min(start + block_size, n_bodies)
+
+    if scenario == "uniform":
+        pos, vel, mass = uniform_block(start, end)
+    else:
+        # Clustered scenarios are shifted to their centre-of-mass frame, which
+        # needs every body, so they are generated in full and sliced
+        pos, vel, mass = (a[start:end] for a in scenarios.generate(scenario, n_bodies))
+
+    bodies = np.zeros((block_size, 4))
+    bodies[:end - start, :3] = pos
+    bodies[:end - start, 3] = mass[:, 0]
+    block_vel = np.zeros((block_size, 3))
+    block_vel[:end - start] = vel
+    return bodies, block_vel, end - start
+
+def accumulate_block(local, other, acc, soft_epsilon=1e-9, max_pairs=1 << 21):
+    # acc[i] += sum_j m_j (r_j - r_i) / |r_j - r_i|^3 for i in local, j in other.
+    # Rows are processed in tiles so the temporary stays around max_pairs * 3 doubles.
+    # Self and padding terms vanish (diff == 0 or m == 0).
+    n_local = local.shape[0]
+    tile = max(1, max_pairs // max(1, other.shape[0]))
+    other_pos = other[None, :, :3]
+    other_mass = other[None, :, 3]
+    for start in range(0, n_local, tile):
+        end = min(start + tile, n_local)
+        diff = other_pos - local[start:end, None, :3]
+        dist_sq = np.sum(diff**2, axis=2) + soft_epsilon
+        force_scalar = other_mass / (dist_sq * np.sqrt(dist_sq))
+        acc[start:end] += np.sum(force_scalar[..., None] * diff, axis=1)
+
+def run_rank(ring, n_bodies, n_steps, dt=0.01, soft_epsilon=1e-9, scenario="uniform"):
+    """Run the simulation for this rank. Returns timing stats for the rank."""
+    bodies, vel, n_local = init_block(n_bodies, ring.rank, ring.size, scenario)
+    acc = np.zeros_like(vel)
+    current = np.empty_like(bodies)
+    incoming = np.empty_like(bodies)
+
+    compute_time = 0.0
+    comm_time = 0.0
+    start_time = time.perf_counter()
+
+    for _ in range(n_steps):
+        acc[:] = 0.0
+        current[:] = bodies
+        for hop in range(ring.size):
+            # Start moving the block on before computing with it
+            handle = ring.shift(current, incoming) if hop < ring.size - 1 else None
+
+            t0 = time.perf_counter()
+            accumulate_block(bodies, current, acc, soft_epsilon)
+            compute_time += time.perf_counter() - t0
+
+            if handle is not None:
+                t0 = time.perf_counter()
+                handle.wait()
+                comm_time += time.perf_counter() - t0
+                current, incoming = incoming, current
+
+        # Update velocity and position (semi-implicit Euler); padding stays put
+        t0 = time.perf_counter()
+        vel[:n_local] += acc[:n_local] * dt
+        bodies[:n_local, :3] += vel[:n_local] * dt
+        compute_time += time.perf_counter() - t0
+
+    total_time = time.perf_counter() - start_time
+    return {
+        "rank": ring.rank,
+        "n_local": n_local,
+        "compute": compute_time,
+        "comm": comm_time,
+        "total": total_time,
+        "checksum": float(bodies[:n_local, :3].sum()),
+    }
+
+def _listen(host, port):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(1)
+    return listener
+
+def _socket_worker(rank, size, addresses, listener, n_bodies, n_steps, dt, scenario, queue):
+    ring = SocketRing(rank, size, addresses, listener=listener)
+    try:
+        queue.put(run_rank(ring, n_bodies, n_steps, dt, scenario=scenario))
+    finally:
+        ring.close()
+
+def run_local(n_bodies, n_steps, n_ranks, dt=0.01, scenario="uniform"):
+    """Launch n_ranks socket-connected processes on this machine. Returns per-rank stats."""
+    # Listeners are bound here on ephemeral ports and handed to the ranks, so
+    # no port is released (and open to another process) before a rank uses it
+    listeners = [_listen("127.0.0.1", 0) for _ in range(n_ranks)]
+    addresses = [listener.getsockname() for listener in listeners]
+    queue = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=_socket_worker,
+                                args=(r, n_ranks, addresses, listeners[r], n_bodies, n_steps, dt, scenario, queue))
+        for r in range(n_ranks)
+    ]
+    try:
+        for p in procs:
+            p.start()
+    finally:
+        # The ranks hold their own copies
+        for listener in listeners:
+            listener.close()
+    stats = [queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return sorted(stats, key=lambda s: s["rank"])
+
+def report(stats):
+    print(f"{'rank':>4} {'bodies':>8} {'compute (s)':>12} {'comm wait (s)':>14} {'total (s)':>10}")
+    for s in stats:
+        print(f"{s['rank']:>4} {s['n_local']:>8} {s['compute']:>12.4f} {s['comm']:>14.4f} {s['total']:>10.4f}")
+    return max(s["total"] for s in stats)
+
+def run_simulation(n_bodies, n_steps, dt=0.01, n_ranks=None, scenario="uniform"):
+    if n_ranks is None:
+        n_ranks = multiprocessing.cpu_count()
+    stats = run_local(n_bodies, n_steps, n_ranks, dt, scenario)
+    return max(s["total"] for s in stats)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ring-decomposition N-body benchmark (mpi4py or sockets)")
+    parser.add_argument("--n", type=int, default=100, help="Number of bodies")
+    parser.add_argument("--steps", type=int, default=100, help="Number of steps")
+    parser.add_argument("--ranks", type=int, default=None, help="Number of local ranks when not launched by mpiexec")
+    parser.add_argument("--scaling", action="store_true", help="Run with 1, 2, 4, ... up to --ranks local ranks and report scaling")
+    parser.add_argument("--rank", type=int, default=None, help="This rank, for a multi-node socket run")
+    parser.add_argument("--hosts", type=str, default=None, help="Comma-separated host:port list (one per rank) for a multi-node socket run")
+    scenarios.add_argument(parser)
+    adaptive.add_arguments(parser)
+    args = parser.parse_args()
+
+    if MPI is not None and MPI.COMM_WORLD.Get_size() > 1:
+        ring = MPIRing(MPI.COMM_WORLD)
+        stats = ring.gather(run_rank(ring, args.n, args.steps, scenario=args.scenario))
+        if ring.rank == 0:
+            print(f"Running Ring N-body (MPI) with N={args.n}, Steps={args.steps}, Ranks={ring.size}")
+            duration = report(stats)
+            print(f"Time: {duration:.4f} seconds")
+            print(f"RESULT: {duration}")
+    elif args.hosts is not None:
+        addresses = []
+        for entry in args.hosts.split(","):
+            host, port = entry.rsplit(":", 1)
+            addresses.append((host, int(port)))
+        ring = SocketRing(args.rank, len(addresses), addresses)
+        try:
+            stats = run_rank(ring, args.n, args.steps, scenario=args.scenario)
+        finally:
+            ring.close()
+        report([stats])
+        print(f"RESULT: {stats['total']}")
+    else:
+        n_ranks = args.ranks or multiprocessing.cpu_count()
+        if args.scaling:
+            counts = []
+            p = 1
+            while p <= n_ranks:
+                counts.append(p)
+                p *= 2
+            if counts[-1] != n_ranks:
+                counts.append(n_ranks)
+            base = None
+            for p in counts:
+                duration = report(run_local(args.n, args.steps, p, scenario=args.scenario))
+                base = base or duration
+                print(f"Ranks={p}: {duration:.4f} seconds, speedup {base / duration:.2f}x, efficiency {base / duration / p:.0%}\n")
+        else:
+            print(f"Running Ring N-body (sockets) with N={args.n}, Steps={adaptive.steps_label(args)}, Ranks={n_ranks}, Scenario={args.scenario}")
+            if args.adaptive:
+                # Single-host socket ring only; ranks are restarted for every batch
+                adaptive.run_cli(args, lambda steps: run_simulation(args.n, steps, n_ranks, scenario=args.scenario))
+                raise SystemExit(0)
+            duration = report(run_local(args.n, args.steps, n_ranks, scenario=args.scenario))
+            print(f"Time: {duration:.4f} seconds")
+            print(f"RESULT: {duration}")
@@ -0,0 +1,175 @@
+import argparse
+import numpy as np
+
+# Named initial conditions for the benchmarks, all generated vectorized in
+# NumPy. "uniform" is the original workload (bodies in a +-100 cube, masses
+# 1-10, same random stream as before). The others are clustered systems in
+# N-body units (G = 1, total mass 1, size of order 1, crossing time of order
+# 1 at dt = 0.01):
+#
+# - plummer:            Plummer sphere in virial equilibrium
+# - cold_collapse:      uniform sphere at rest that collapses violently
+# - colliding_clusters: two Plummer spheres on a slightly off-axis collision course
+# - disk:               cold exponential disk on circular orbits around a heavy central body
+#
+#   pos, vel, mass = scenarios.generate("plummer", 1000)
+
+DEFAULT_SCENARIO = "uniform"
+
+def _uniform(n_bodies, rng):
+    # Same draws, in the same order, as the original init_bodies
+    np.random.seed(42)
+    pos = np.random.uniform(-100, 100, (n_bodies, 3))
+    vel = np.random.uniform(-1, 1, (n_bodies, 3))
+    mass = np.random.uniform(1, 10, n_bodies)
+    return pos, vel, mass
+
+def _isotropic(radius, rng):
+    # Vectors of the given lengths in uniformly random directions
+    cos_theta = rng.uniform(-1.0, 1.0, radius.shape[0])
+    phi = rng.uniform(0.0, 2.0 * np.pi, radius.shape[0])
+    sin_theta = np.sqrt(1.0 - cos_theta**2)
+    return radius[:, None] * np.stack([sin_theta * np.cos(phi), sin_theta * np.sin(phi), cos_theta], axis=1)
+
+def _to_com_frame(pos, vel, mass):
+    w = mass / mass.sum()
+    pos -= w @ pos
+    vel -= w @ vel
+    return pos, vel
+
+def plummer_sphere(n_bodies, rng, total_mass=1.0):
+    """Plummer model sampled as in Aarseth, Henon & Wielen (1974), with scale
+    radius 3*pi/16 so that the virial radius is 1."""
+    a = 3.0 * np.pi / 16.0
+    mass = np.full(n_bodies, total_mass / n_bodies)
+
+    # Inverse of the cumulative mass profile, truncated at 99.9% of the mass
+    x = rng.uniform(0.0, 0.999, n_bodies)
+    r = a / np.sqrt(x**(-2.0 / 3.0) - 1.0)
+    pos = _isotropic(r, rng)
+
+    # Speed as a fraction q of the local escape speed, q ~ q^2 (1 - q^2)^3.5,
+    # by batched rejection sampling
+    q = np.empty(0)
+    while q.size < n_bodies:
+        cand = rng.uniform(0.0, 1.0, 2 * n_bodies)
+        accept = rng.uniform(0.0, 0.1, 2 * n_bodies) < cand**2 * (1.0 - cand**2)**3.5
+        q = np.concatenate([q, cand[accept]])
+    v_esc = np.sqrt(2.0 * total_mass / a) * (1.0 + (r / a)**2)**-0.25
+    vel = _isotropic(q[:n_bodies] * v_esc, rng)
+
+    pos, vel = _to_com_frame(pos, vel, mass)
+    return pos, vel, mass
+
+def _plummer(n_bodies, rng):
+    return plummer_sphere(n_bodies, rng)
+
+def _cold_collapse(n_bodies, rng):
+    # Uniform-density unit sphere with no kinetic energy
+    mass = np.full(n_bodies, 1.0 / n_bodies)
+    r = rng.uniform(0.0, 1.0, n_bodies) ** (1.0 / 3.0)
+    pos = _isotropic(r, rng)
+    vel = np.zeros((n_bodies, 3))
+    pos, vel = _to_com_frame(pos, vel, mass)
+    return pos, vel, mass
+
+def _colliding_clusters(n_bodies, rng):
+    # Two half-mass Plummer spheres 8 apart with impact parameter 1, approaching
+    # at roughly their mutual escape speed
+    n_a = n_bodies // 2
+    pos_a, vel_a, mass_a = plummer_sphere(n_a, rng, total_mass=0.5)
+    pos_b, vel_b, mass_b = plummer_sphere(n_bodies - n_a, rng, total_mass=0.5)
+    offset = np.array([4.0, 0.5, 0.0])
+    approach = np.array([0.25, 0.0, 0.0])
+    pos = np.concatenate([pos_a - offset, pos_b + offset])
+    vel = np.concatenate([vel_a + approach, vel_b - approach])
+    mass = np.concatenate([mass_a, mass_b])
+    pos, vel = _to_com_frame(pos, vel, mass)
+    return pos, vel, mass
+
+def _disk(n_bodies, rng, disk_mass=0.1, scale_length=1.0, scale_height=0.05):
+    # Body 0 is the central mass; the rest form an exponential disk
+    n_disk = n_bodies - 1
+    central_mass = 1.0 - disk_mass
+    mass = np.concatenate([[central_mass], np.full(n_disk, disk_mass / max(n_disk, 1))])
+
+    # Surface density ~ exp(-R / R_d) gives p(R) ~ R exp(-R / R_d), a Gamma(2) law
+    radius = np.maximum(rng.gamma(2.0, scale_length, n_disk), 0.1 * scale_length)
+    phi = rng.uniform(0.0, 2.0 * np.pi, n_disk)
+    z = rng.normal(0.0, scale_height, n_disk)
+    pos = np.concatenate([np.zeros((1, 3)), np.stack([radius * np.cos(phi), radius * np.sin(phi), z], axis=1)])
+
+    # Circular speed from the central body plus the disk mass inside R, with a
+    # small velocity dispersion
+    s = radius / scale_length
+    enclosed = central_mass + disk_mass * (1.0 - (1.0 + s) * np.exp(-s))
+    v_circ = np.sqrt(enclosed / radius)
+    vel_disk = np.stack([-v_circ * np.sin(phi), v_circ * np.cos(phi), np.zeros(n_disk)], axis=1)
+    vel_disk += rng.normal(0.0, 0.05, (n_disk, 3)) * v_circ[:, None]
+    vel = np.concatenate([np.zeros((1, 3)), vel_disk])
+
+    pos, vel = _to_com_frame(pos, vel, mass)
+    return pos, vel, mass
+
+SCENARIOS = {
+    "uniform": _uniform,
+    "plummer": _plummer,
+    "cold_collapse": _cold_collapse,
+    "colliding_clusters": _colliding_clusters,
+    "disk": _disk,
+}
+
+def generate(name, n_bodies, seed=42):
+    """(pos, vel, mass) float64 arrays of shapes (N, 3), (N, 3) and (N, 1)."""
+    if name not in SCENARIOS:
+        raise ValueError(f"Unknown scenario: {name} (choose from {', '.join(SCENARIOS)})")
+    rng = np.random.default_rng(seed)
+    pos, vel, mass = SCENARIOS[name](n_bodies, rng)
+    return np.ascontiguousarray(pos), np.ascontiguousarray(vel), np.ascontiguousarray(mass.reshape(-1, 1))
+
+def generate_rows(name, n_bodies, seed=42):
+    """The scenario as a list of [x, y, z, vx, vy, vz, m] lists, for the list-based backends."""
+    pos, vel, mass = generate(name, n_bodies, seed)
+    return np.hstack([pos, vel, mass]).tolist()
+
+def add_argument(parser):
+    parser.add_argument("--scenario", choices=list(SCENARIOS), default=DEFAULT_SCENARIO, help="Initial conditions (see scenarios.py)")
+
+# Columns of the records written by the fused diagnostics kernels
+# (run_steps_diagnostics in numba_impl and cython_impl, NBodyTaichi.run_diagnostics)
+DIAG_COLUMNS = ("step", "kinetic", "potential", "px", "py", "pz", "virial")
+
+def report_diagnostics(records, plain, duration):
+    """Print energy, momentum and virial ratio per diagnostics record, and the
+    overhead of the diagnostics run (duration) over the plain one (plain)."""
+    print(f"{'step':>6} {'energy':>14} {'|momentum|':>12} {'2K/|W|':>8}")
+    for step, kinetic, potential, px, py, pz, virial in records:
+        momentum = (px*px + py*py + pz*pz) ** 0.5
+        print(f"{int(step):>6} {kinetic + potential:>14.6e} {momentum:>12.6e} {2 * kinetic / abs(virial):>8.4f}")
+    print(f"Plain kernel: {plain:.4f} seconds, with diagnostics: {duration:.4f} seconds, overhead {100 * (duration / plain - 1):.1f}%")
+
+def summary(pos, vel, mass):
+    """Virial ratio, half-mass radius and total energy (direct sum)."""
+    m = mass.reshape(-1)
+    kinetic = 0.5 * np.sum(m * np.sum(vel**2, axis=1))
+    potential = 0.0
+    for start in range(0, len(m), 1024):
+        diff = pos[None, :, :] - pos[start:start + 1024, None, :]
+        dist = np.sqrt(np.sum(diff**2, axis=2))
+        rows = np.arange(dist.shape[0])
+        dist[rows, rows + start] = np.inf
+        potential -= 0.5 * np.sum(m[start:start + 1024, None] * m[None, :] / dist)
+    com = (m @ pos) / m.sum()
+    r = np.linalg.norm(pos - com, axis=1)
+    order = np.argsort(r)
+    half = order[np.searchsorted(np.cumsum(m[order]), 0.5 * m.sum())]
+    return {"virial_ratio": 2.0 * kinetic / -potential, "half_mass_radius": r[half], "energy": kinetic + potential}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print summary statistics of the benchmark scenarios")
+    parser.add_argument("--n", type=int, default=1000, help="Number of bodies")
+    args = parser.parse_args()
+
+    for name in SCENARIOS:
+        stats = summary(*generate(name, args.n))
+        print(f"{name:>18}: virial ratio {stats['virial_ratio']:.3f}, half-mass radius {stats['half_mass_radius']:.3f}, energy {stats['energy']:.4g}")
@@ -0,0 +1,150 @@
+import argparse
+import array
+import os
+import random
+import sys
+import time
+from multiprocessing import shared_memory
+import adaptive
+import subinterp_worker
+from thread_impl import make_ranges
+
+# Subinterpreter backend: the pure-Python force loop runs in row blocks on an
+# InterpreterPoolExecutor. Each worker is an isolated interpreter with its own
+# GIL (PEP 684), so the blocks run in parallel inside one process, without
+# the process startup and pickling of mp_impl and without the GIL
+# serialization of thread_impl's python kernel.
+#
+# Positions, masses and accelerations live in one shared-memory block that
+# every interpreter maps (see subinterp_worker.py); a step only sends
+# (start, end) to each worker.
+#
+# Needs concurrent.interpreters (Python 3.14+) or, on 3.13, the PEP 734
+# backport: pip install interpreters-pep-734. NumPy is only needed for the
+# clustered scenarios.
+
+try:
+    from concurrent import interpreters
+    from concurrent.futures import InterpreterPoolExecutor
+except ImportError:
+    try:
+        from interpreters_backport import interpreters
+        from interpreters_backport.concurrent.futures import InterpreterPoolExecutor
+    except ImportError:
+        interpreters = None
+        InterpreterPoolExecutor = None
+
+def available():
+    return InterpreterPoolExecutor is not None
+
+def init_bodies(n_bodies, scenario="uniform"):
+    # Same initial conditions as thread_impl's python kernel
+    if scenario != "uniform":
+        # Clustered scenarios are generated with NumPy
+        import scenarios
+        return [list(col) for col in zip(*scenarios.generate_rows(scenario, n_bodies))]
+    xs, ys, zs, vxs, vys, vzs, ms = [], [], [], [], [], [], []
+    random.seed(42)
+    for _ in range(n_bodies):
+        xs.append(random.uniform(-100, 100))
+        ys.append(random.uniform(-100, 100))
+        zs.append(random.uniform(-100, 100))
+        vxs.append(random.uniform(-1, 1))
+        vys.append(random.uniform(-1, 1))
+        vzs.append(random.uniform(-1, 1))
+        ms.append(random.uniform(1, 10))
+    return xs, ys, zs, vxs, vys, vzs, ms
+
+def run_simulation(n_bodies, n_steps, dt=0.01, n_workers=None, n_chunks=None, scenario="uniform"):
+    if not available():
+        raise RuntimeError("Subinterpreters need Python 3.14+ (concurrent.interpreters) or the interpreters-pep-734 backport on 3.13")
+    n_workers = n_workers or os.cpu_count() or 1
+    ranges = make_ranges(n_bodies, n_chunks or n_workers)
+    xs, ys, zs, vxs, vys, vzs, ms = init_bodies(n_bodies, scenario)
+
+    shm = shared_memory.SharedMemory(create=True, size=7 * 8 * max(n_bodies, 1))
+    data = shm.buf.cast("d")
+    x, y, z, m, ax, ay, az = (data[k * n_bodies:(k + 1) * n_bodies] for k in range(7))
+    try:
+        for view, values in ((x, xs), (y, ys), (z, zs), (m, ms)):
+            view[:] = array.array("d", values)
+
+        with InterpreterPoolExecutor(max_workers=n_workers, initializer=subinterp_worker.attach,
+                                     initargs=(shm.name, n_bodies)) as pool:
+            # Start every worker (interpreter creation and imports) before timing
+            for fut in [pool.submit(subinterp_worker.force_chunk, 0, 0) for _ in range(n_workers)]:
+                fut.result()
+
+            start_time = time.time()
+            for _ in range(n_steps):
+                futures = [pool.submit(subinterp_worker.force_chunk, start, end) for start, end in ranges]
+                for fut in futures:
+                    fut.result()
+
+                # Update velocity and position (semi-implicit Euler)
+                for i in range(n_bodies):
+                    vxs[i] += ax[i] * dt
+                    vys[i] += ay[i] * dt
+                    vzs[i] += az[i] * dt
+                    x[i] += vxs[i] * dt
+                    y[i] += vys[i] * dt
+                    z[i] += vzs[i] * dt
+            end_time = time.time()
+    finally:
+        for view in (x, y, z, m, ax, ay, az, data):
+            view.release()
+        shm.close()
+        shm.unlink()
+    return end_time - start_time
+
+def compare(n_bodies, n_steps, n_workers=None, scenario="uniform"):
+    """Seconds per step for the pure-Python kernel in one thread, in
+    subinterpreters, on a thread pool and in a process pool, all with the
+    same number of workers. Returns [(label, seconds per step)]."""
+    import baseline
+    import mp_impl
+    import thread_impl
+    n_workers = n_workers or os.cpu_count() or 1
+    runs = [
+        ("serial (baseline.py)", lambda: baseline.run_simulation(n_bodies, n_steps, scenario=scenario)),
+        ("subinterpreters", lambda: run_simulation(n_bodies, n_steps, n_workers=n_workers, scenario=scenario)),
+        ("threads (python kernel)", lambda: thread_impl.run_simulation(n_bodies, n_steps, n_threads=n_workers, kernel="python",
+                                                                       scenario=scenario)),
+        ("multiprocessing", lambda: mp_impl.run_simulation(n_bodies, n_steps, n_processes=n_workers, scenario=scenario)),
+    ]
+    return [(label, run() / n_steps) for label, run in runs]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Subinterpreter N-body benchmark (PEP 734)")
+    parser.add_argument("--n", type=int, default=100, help="Number of bodies")
+    parser.add_argument("--steps", type=int, default=100, help="Number of steps")
+    parser.add_argument("--workers", type=int, default=None, help="Number of subinterpreters (default: CPU count)")
+    parser.add_argument("--chunks", type=int, default=None, help="Number of row blocks per step (default: one per worker)")
+    parser.add_argument("--compare", action="store_true", help="Also time the serial, thread-pool and multiprocessing backends with the same workers")
+    parser.add_argument("--scenario", default="uniform", help="Initial conditions (see scenarios.py; non-uniform ones need NumPy)")
+    adaptive.add_arguments(parser)
+    args = parser.parse_args()
+
+    if not available():
+        print(f"Subinterpreters are not available on Python {sys.version.split()[0]} "
+              "(need 3.14+, or 3.13 with pip install interpreters-pep-734). Exiting.")
+        sys.exit(1)
+
+    if args.compare:
+        workers = args.workers or os.cpu_count() or 1
+        print(f"Pure-Python kernel with N={args.n}, Steps={args.steps}, Workers={workers}, Scenario={args.scenario}")
+        results = compare(args.n, args.steps, workers, args.scenario)
+        serial = results[0][1]
+        for label, per_step in results:
+            print(f"{label:>24}: {per_step * 1e3:10.3f} ms/step, speedup {serial / per_step:5.2f}x")
+        sys.exit(0)
+
+    print(f"Running Subinterpreter N-body with N={args.n}, Steps={adaptive.steps_label(args)}, Workers={args.workers}, "
+          f"Scenario={args.scenario}")
+    run = lambda steps: run_simulation(args.n, steps, n_workers=args.workers, n_chunks=args.chunks, scenario=args.scenario)
+    if args.adaptive:
+        adaptive.run_cli(args, run)
+        sys.exit(0)
+    duration = run(args.steps)
+    print(f"Time: {duration:.4f} seconds")
+    print(f"RESULT: {duration}")
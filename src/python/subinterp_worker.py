@@ -0,0 +1,66 @@
+import atexit
+import math
+from multiprocessing import shared_memory
+
+# Code that runs inside the subinterpreters of subinterp_impl.py. It is a
+# separate module because workers import it by name, and it must only use
+# modules that support isolated interpreters (no NumPy).
+#
+# The state lives in one shared-memory block of 7 * N doubles laid out as
+# x | y | z | mass | ax | ay | az. Each worker attaches to it by name and
+# keeps memoryviews into it, so nothing is pickled or copied between
+# interpreters; each chunk writes only its own rows of ax/ay/az.
+
+_shm = None
+_views = None
+
+def attach(name, n_bodies):
+    # Executor initializer: runs once in every worker interpreter
+    global _shm, _views
+    # Only the creating process tracks (and unlinks) the block
+    _shm = shared_memory.SharedMemory(name=name, track=False)
+    data = _shm.buf.cast("d")
+    _views = tuple(data[k * n_bodies:(k + 1) * n_bodies] for k in range(7))
+    data.release()
+    # Exported buffers must be released before the interpreter can close the block
+    atexit.register(detach)
+
+def detach():
+    global _shm, _views
+    if _views is not None:
+        for view in _views:
+            view.release()
+        _views = None
+    if _shm is not None:
+        _shm.close()
+        _shm = None
+
+def force_chunk(start, end, soft_epsilon=1e-9):
+    # Reads the shared block in place: no per-step copy of the coordinates
+    xs, ys, zs, ms, ax, ay, az = _views
+    n = len(xs)
+    for i in range(start, end):
+        fx = 0.0
+        fy = 0.0
+        fz = 0.0
+        x1, y1, z1 = xs[i], ys[i], zs[i]
+
+        for j in range(n):
+            if i == j:
+                continue
+
+            dx = xs[j] - x1
+            dy = ys[j] - y1
+            dz = zs[j] - z1
+
+            dist_sq = dx*dx + dy*dy + dz*dz + soft_epsilon
+            dist = math.sqrt(dist_sq)
+            f = ms[j] / (dist_sq * dist)
+
+            fx += f * dx
+            fy += f * dy
+            fz += f * dz
+
+        ax[i] = fx
+        ay[i] = fy
+        az[i] = fz
@@ -2,27 +2,35 @@ import argparse
 import time
 import taichi as ti
 import numpy as np
+import tuning
+import scenarios
+import adaptive
 
 # Initialize Taichi
-# Using cpu for fairness comparison with others initially, but can be switched to gpu
-ti.init(arch=ti.cpu) 
+# Using cpu for fairness comparison with others initially, but can be switched to gpu.
+# default_fp=f64 makes untyped locals, literals and Python-scope constants
+# (dt, soft_epsilon) double precision; Taichi's default is f32.
+ti.init(arch=ti.cpu, default_fp=ti.f64)
 
 @ti.data_oriented
 class NBodyTaichi:
-    def __init__(self, n_bodies, dt=0.01, soft_epsilon=1e-9):
+    def __init__(self, n_bodies, dt=0.01, soft_epsilon=1e-9, scenario="uniform"):
         self.n = n_bodies
         self.dt = dt
         self.soft_epsilon = soft_epsilon
+        self.scenario = scenario
         
         self.pos = ti.Vector.field(3, dtype=ti.f64, shape=self.n)
         self.vel = ti.Vector.field(3, dtype=ti.f64, shape=self.n)
         self.mass = ti.field(dtype=ti.f64, shape=self.n)
+        # Per-body potential and (kinetic, potential, px, py, pz, virial),
+        # filled in by compute_step_diagnostics
+        self.phi = ti.field(dtype=ti.f64, shape=self.n)
+        self.diag = ti.field(dtype=ti.f64, shape=6)
 
     def initialize(self):
-        np.random.seed(42)
-        pos_np = np.random.uniform(-100, 100, (self.n, 3))
-        vel_np = np.random.uniform(-1, 1, (self.n, 3))
-        mass_np = np.random.uniform(1, 10, (self.n,))
+        pos_np, vel_np, mass_np = scenarios.generate(self.scenario, self.n)
+        mass_np = mass_np[:, 0].copy()
         
         self.pos.from_numpy(pos_np)
         self.vel.from_numpy(vel_np)
@@ -53,32 +61,254 @@ class NBodyTaichi:
         for i in range(self.n):
             self.pos[i] += self.vel[i] * self.dt
 
+    @ti.kernel
+    def compute_step_diagnostics(self):
+        # compute_step with the potential accumulated in the same j-loop.
+        # Energy, momentum and virial of the state at the start of the step
+        # are summed with atomic adds, which Taichi lowers to parallel reductions.
+        for k in range(6):
+            self.diag[k] = 0.0
+
+        for i in range(self.n):
+            fx = ti.f64(0.0)
+            fy = ti.f64(0.0)
+            fz = ti.f64(0.0)
+            pot = ti.f64(0.0)
+            p1 = self.pos[i]
+
+            for j in range(self.n):
+                if i != j:
+                    p2 = self.pos[j]
+                    disp = p2 - p1
+                    dist_sq = disp.norm_sqr() + self.soft_epsilon
+                    dist = ti.sqrt(dist_sq)
+                    f = self.mass[j] / (dist_sq * dist)
+                    pot -= self.mass[j] / dist
+
+                    fx += f * disp[0]
+                    fy += f * disp[1]
+                    fz += f * disp[2]
+
+            mi = self.mass[i]
+            v = self.vel[i]
+            self.phi[i] = pot
+            self.diag[0] += 0.5 * mi * v.norm_sqr()
+            self.diag[1] += 0.5 * mi * pot
+            self.diag[2] += mi * v[0]
+            self.diag[3] += mi * v[1]
+            self.diag[4] += mi * v[2]
+            self.diag[5] += mi * (p1[0] * fx + p1[1] * fy + p1[2] * fz)
+
+            self.vel[i] += ti.Vector([fx, fy, fz]) * self.dt
+
+        for i in range(self.n):
+            self.pos[i] += self.vel[i] * self.dt
+
     def run(self, steps):
         for _ in range(steps):
             self.compute_step()
 
-def run_simulation(n_bodies, n_steps, dt=0.01):
-    sim = NBodyTaichi(n_bodies, dt)
+    def run_diagnostics(self, steps, every):
+        """Like run(), but every `every`-th step (starting with the first) uses the
+        fused diagnostics kernel. Returns rows of (step, kinetic, potential, px, py, pz, virial)."""
+        records = []
+        for step in range(steps):
+            if step % every == 0:
+                self.compute_step_diagnostics()
+                records.append((step,) + tuple(self.diag.to_numpy()))
+            else:
+                self.compute_step()
+        return records
+
+@ti.data_oriented
+class NBodyTaichiTiled:
+    """Scalar-field N-body with separate force and drift kernels.
+
+    layout="soa" places x, y and z in separate dense blocks so the j-loop
+    reads three contiguous arrays; layout="aos" places them interleaved in a
+    single block. Forces are accumulated one j-tile of `tile` bodies at a
+    time: each tile is one kernel launch in which every i (in parallel) sums
+    over the same `tile` bodies, so the tile stays in cache for the whole
+    launch instead of the full j range streaming through it for every i.
+    `block_dim`/`threads` are passed through ti.loop_config.
+    """
+
+    def __init__(self, n_bodies, dt=0.01, soft_epsilon=1e-9, layout="soa", tile=1024, block_dim=128, threads=None,
+                 scenario="uniform"):
+        self.n = n_bodies
+        self.dt = dt
+        self.soft_epsilon = soft_epsilon
+        self.scenario = scenario
+        self.tile = tile
+        self.n_tiles = (n_bodies + tile - 1) // tile
+        self.block_dim = block_dim
+        self.threads = threads
+
+        self.x = ti.field(dtype=ti.f64)
+        self.y = ti.field(dtype=ti.f64)
+        self.z = ti.field(dtype=ti.f64)
+        self.mass = ti.field(dtype=ti.f64, shape=self.n)
+        self.vx = ti.field(dtype=ti.f64, shape=self.n)
+        self.vy = ti.field(dtype=ti.f64, shape=self.n)
+        self.vz = ti.field(dtype=ti.f64, shape=self.n)
+        # Force sums over the tiles processed so far in this step
+        self.ax = ti.field(dtype=ti.f64, shape=self.n)
+        self.ay = ti.field(dtype=ti.f64, shape=self.n)
+        self.az = ti.field(dtype=ti.f64, shape=self.n)
+
+        if layout == "soa":
+            ti.root.dense(ti.i, self.n).place(self.x)
+            ti.root.dense(ti.i, self.n).place(self.y)
+            ti.root.dense(ti.i, self.n).place(self.z)
+        elif layout == "aos":
+            ti.root.dense(ti.i, self.n).place(self.x, self.y, self.z)
+        else:
+            raise ValueError(f"Unknown layout: {layout}")
+
+    def initialize(self):
+        pos_np, vel_np, mass_np = scenarios.generate(self.scenario, self.n)
+        mass_np = mass_np[:, 0].copy()
+
+        self.x.from_numpy(np.ascontiguousarray(pos_np[:, 0]))
+        self.y.from_numpy(np.ascontiguousarray(pos_np[:, 1]))
+        self.z.from_numpy(np.ascontiguousarray(pos_np[:, 2]))
+        self.vx.from_numpy(np.ascontiguousarray(vel_np[:, 0]))
+        self.vy.from_numpy(np.ascontiguousarray(vel_np[:, 1]))
+        self.vz.from_numpy(np.ascontiguousarray(vel_np[:, 2]))
+        self.mass.from_numpy(mass_np)
+
+    @ti.kernel
+    def accumulate_tile(self, j_start: ti.i32, j_end: ti.i32):
+        # Adds the forces of bodies j_start..j_end on every body
+        ti.loop_config(block_dim=self.block_dim, parallelize=self.threads)
+        for i in range(self.n):
+            fx = ti.f64(0.0)
+            fy = ti.f64(0.0)
+            fz = ti.f64(0.0)
+            x1 = self.x[i]
+            y1 = self.y[i]
+            z1 = self.z[i]
+
+            for j in range(j_start, j_end):
+                if i != j:
+                    dx = self.x[j] - x1
+                    dy = self.y[j] - y1
+                    dz = self.z[j] - z1
+                    dist_sq = dx * dx + dy * dy + dz * dz + self.soft_epsilon
+                    dist = ti.sqrt(dist_sq)
+                    f = self.mass[j] / (dist_sq * dist)
+
+                    fx += f * dx
+                    fy += f * dy
+                    fz += f * dz
+
+            self.ax[i] += fx
+            self.ay[i] += fy
+            self.az[i] += fz
+
+    def compute_forces(self):
+        for t in range(self.n_tiles):
+            self.accumulate_tile(t * self.tile, min((t + 1) * self.tile, self.n))
+
+    @ti.kernel
+    def update_positions(self):
+        # Kick with the accumulated forces, drift, and reset the sums
+        ti.loop_config(block_dim=self.block_dim, parallelize=self.threads)
+        for i in range(self.n):
+            self.vx[i] += self.ax[i] * self.dt
+            self.vy[i] += self.ay[i] * self.dt
+            self.vz[i] += self.az[i] * self.dt
+            self.ax[i] = 0.0
+            self.ay[i] = 0.0
+            self.az[i] = 0.0
+            self.x[i] += self.vx[i] * self.dt
+            self.y[i] += self.vy[i] * self.dt
+            self.z[i] += self.vz[i] * self.dt
+
+    def run(self, steps):
+        for _ in range(steps):
+            self.compute_forces()
+            self.update_positions()
+
+def run_simulation_diagnostics(n_bodies, n_steps, every, dt=0.01, scenario="uniform"):
+    """Time NBodyTaichi.run_diagnostics. Returns (elapsed, records)."""
+    sim = NBodyTaichi(n_bodies, dt, scenario=scenario)
+
+    # Warmup (JIT compilation of both kernels), then reset the state
+    sim.initialize()
+    sim.run_diagnostics(2, 2)
     sim.initialize()
-    
-    # Warmup (JIT compilation)
+
+    ti.sync()
+    start_time = time.time()
+    records = sim.run_diagnostics(n_steps, every)
+    ti.sync()
+    end_time = time.time()
+
+    return end_time - start_time, records
+
+def make_simulation(n_bodies, dt=0.01, layout="vector", tile=None, block_dim=None, threads=None, scenario="uniform"):
+    """An initialized, compiled simulation. Time it with time_run()."""
+    # Parameters left as None come from the tuning cache for this machine (see tuning.py)
+    defaults = {"threads": None} if layout == "vector" else {"tile": 1024, "block_dim": 128, "threads": None}
+    params = tuning.resolve(f"taichi-{layout}", n_bodies, defaults, tile=tile, block_dim=block_dim, threads=threads)
+    threads = params["threads"]
+    if threads is not None:
+        # Re-initialize so the runtime's thread pool matches the requested size
+        ti.init(arch=ti.cpu, default_fp=ti.f64, cpu_max_num_threads=threads)
+
+    if layout == "vector":
+        sim = NBodyTaichi(n_bodies, dt, scenario=scenario)
+    else:
+        sim = NBodyTaichiTiled(n_bodies, dt, layout=layout, tile=params["tile"], block_dim=params["block_dim"], threads=threads,
+                               scenario=scenario)
+    sim.initialize()
+
+    # Warmup (JIT compilation), then reset the state
     sim.run(1)
-    
+    sim.initialize()
+    return sim
+
+def time_run(sim, n_steps):
     ti.sync()
     start_time = time.time()
     sim.run(n_steps)
     ti.sync()
     end_time = time.time()
-    
     return end_time - start_time
 
+def run_simulation(n_bodies, n_steps, dt=0.01, layout="vector", tile=None, block_dim=None, threads=None, scenario="uniform"):
+    sim = make_simulation(n_bodies, dt, layout, tile, block_dim, threads, scenario)
+    return time_run(sim, n_steps)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Taichi N-body benchmark")
     parser.add_argument("--n", type=int, default=100, help="Number of bodies")
     parser.add_argument("--steps", type=int, default=100, help="Number of steps")
+    parser.add_argument("--layout", choices=["vector", "aos", "soa"], default="vector", help="Field layout (vector = original AoS Vector.field kernel)")
+    parser.add_argument("--tile", type=int, default=None, help="Bodies per j-tile (one kernel launch each) for the aos/soa force pass (default: tuned value or 1024)")
+    parser.add_argument("--block-dim", type=int, default=None, help="ti.loop_config block_dim for the aos/soa kernels (default: tuned value or 128)")
+    parser.add_argument("--threads", type=int, default=None, help="Number of CPU threads (default: tuned value or all cores)")
+    parser.add_argument("--diag-every", type=int, default=None, help="Fuse energy/momentum/virial diagnostics into every K-th step and report the overhead")
+    scenarios.add_argument(parser)
+    adaptive.add_arguments(parser)
     args = parser.parse_args()
 
-    print(f"Running Taichi N-body with N={args.n}, Steps={args.steps}")
-    duration = run_simulation(args.n, args.steps)
+    if args.diag_every is not None:
+        print(f"Running Taichi N-body with N={args.n}, Steps={args.steps}, Scenario={args.scenario}, Diagnostics every {args.diag_every} steps")
+        plain = run_simulation(args.n, args.steps, scenario=args.scenario)
+        duration, records = run_simulation_diagnostics(args.n, args.steps, args.diag_every, scenario=args.scenario)
+        scenarios.report_diagnostics(records, plain, duration)
+        print(f"RESULT: {duration}")
+        raise SystemExit(0)
+
+    print(f"Running Taichi N-body with N={args.n}, Steps={adaptive.steps_label(args)}, Layout={args.layout}, Scenario={args.scenario}")
+    sim = make_simulation(args.n, layout=args.layout, tile=args.tile, block_dim=args.block_dim, threads=args.threads,
+                          scenario=args.scenario)
+    if args.adaptive:
+        # One simulation (and one compilation) for all batches; the state carries over
+        adaptive.run_cli(args, lambda steps: time_run(sim, steps))
+        raise SystemExit(0)
+    duration = time_run(sim, args.steps)
     print(f"Time: {duration:.4f} seconds")
     print(f"RESULT: {duration}")
@@ -0,0 +1,182 @@
+import argparse
+import os
+import sys
+import time
+import math
+import random
+from concurrent.futures import ThreadPoolExecutor
+import adaptive
+
+# Thread-pool backend: the force computation is split into row blocks that
+# run on a ThreadPoolExecutor. All threads read and write the same arrays
+# (no pickling, no copies); each block writes only its own rows of `acc`.
+#
+# Kernels:
+# - numpy:  vectorized chunk, NumPy releases the GIL inside its loops
+# - cython: cython_impl.compute_forces_chunk, which runs under `with nogil`
+# - python: pure-Python chunk; only parallel on a free-threaded build (3.13t)
+#
+# NumPy, tuning and scenarios are imported only where they are used, so the
+# python kernel with the uniform scenario runs on an interpreter without
+# NumPy (free-threaded builds often have none).
+
+sys.path.append(os.path.join(os.getcwd(), 'src', 'python'))
+
+def gil_enabled():
+    # sys._is_gil_enabled() exists from 3.13; older interpreters always have a GIL
+    check = getattr(sys, "_is_gil_enabled", None)
+    return True if check is None else check()
+
+def numpy_chunk(pos, mass, acc, start, end, soft_epsilon=1e-9):
+    import numpy as np
+    # diff[i, j] = pos[j] - pos[start + i]
+    diff = pos[None, :, :] - pos[start:end, None, :]
+    dist_sq = np.sum(diff**2, axis=2) + soft_epsilon
+    force_scalar = mass.T / (dist_sq * np.sqrt(dist_sq))
+    # Self term: diff is 0, so no explicit mask is needed
+    acc[start:end] = np.sum(force_scalar[..., None] * diff, axis=1)
+
+def python_chunk(xs, ys, zs, ms, ax, ay, az, start, end, soft_epsilon=1e-9):
+    n = len(xs)
+    for i in range(start, end):
+        fx = 0.0
+        fy = 0.0
+        fz = 0.0
+        x1, y1, z1 = xs[i], ys[i], zs[i]
+
+        for j in range(n):
+            if i == j:
+                continue
+
+            dx = xs[j] - x1
+            dy = ys[j] - y1
+            dz = zs[j] - z1
+
+            dist_sq = dx*dx + dy*dy + dz*dz + soft_epsilon
+            dist = math.sqrt(dist_sq)
+            f = ms[j] / (dist_sq * dist)
+
+            fx += f * dx
+            fy += f * dy
+            fz += f * dz
+
+        ax[i] = fx
+        ay[i] = fy
+        az[i] = fz
+
+def make_ranges(n_bodies, n_chunks):
+    chunk_size = (n_bodies + n_chunks - 1) // n_chunks
+    ranges = []
+    for i in range(n_chunks):
+        start = i * chunk_size
+        end = min((i + 1) * chunk_size, n_bodies)
+        if start < end:
+            ranges.append((start, end))
+    return ranges
+
+def run_simulation(n_bodies, n_steps, dt=0.01, n_threads=None, kernel="numpy", n_chunks=None, scenario="uniform"):
+    # Unset parameters come from the tuning cache for this machine (see tuning.py)
+    import tuning
+    params = tuning.resolve(f"threads-{kernel}", n_bodies, {"n_threads": os.cpu_count() or 1, "n_chunks": None},
+                            n_threads=n_threads, n_chunks=n_chunks)
+    n_threads = params["n_threads"]
+    n_chunks = params["n_chunks"] or n_threads
+    ranges = make_ranges(n_bodies, n_chunks)
+
+    if kernel == "python":
+        return _run_python(n_bodies, n_steps, dt, n_threads, ranges, scenario)
+
+    if kernel == "cython":
+        try:
+            import cython_impl
+        except ImportError:
+            raise ImportError("Could not import cython_impl. Make sure to compile it first.")
+        chunk_fn = cython_impl.compute_forces_chunk
+    elif kernel == "numpy":
+        chunk_fn = numpy_chunk
+    else:
+        raise ValueError(f"Unknown kernel: {kernel}")
+
+    import numpy as np
+    import scenarios
+    pos, vel, mass = scenarios.generate(scenario, n_bodies)
+    acc = np.zeros((n_bodies, 3))
+    # The Cython chunk takes a 1-D mass memoryview
+    mass_arg = mass if kernel == "numpy" else np.ascontiguousarray(mass[:, 0])
+
+    start_time = time.time()
+
+    with ThreadPoolExecutor(max_workers=n_threads) as pool:
+        for _ in range(n_steps):
+            futures = [pool.submit(chunk_fn, pos, mass_arg, acc, start, end) for start, end in ranges]
+            for fut in futures:
+                fut.result()
+
+            # Update velocity and position (semi-implicit Euler)
+            vel += acc * dt
+            pos += vel * dt
+
+    end_time = time.time()
+    return end_time - start_time
+
+def _run_python(n_bodies, n_steps, dt, n_threads, ranges, scenario="uniform"):
+    # Same initial conditions as baseline.py, stored as flat lists
+    xs, ys, zs, vxs, vys, vzs, ms = [], [], [], [], [], [], []
+    if scenario == "uniform":
+        random.seed(42)
+        for _ in range(n_bodies):
+            xs.append(random.uniform(-100, 100))
+            ys.append(random.uniform(-100, 100))
+            zs.append(random.uniform(-100, 100))
+            vxs.append(random.uniform(-1, 1))
+            vys.append(random.uniform(-1, 1))
+            vzs.append(random.uniform(-1, 1))
+            ms.append(random.uniform(1, 10))
+    else:
+        # Clustered scenarios are generated with NumPy
+        import scenarios
+        xs, ys, zs, vxs, vys, vzs, ms = (list(col) for col in zip(*scenarios.generate_rows(scenario, n_bodies)))
+    ax = [0.0] * n_bodies
+    ay = [0.0] * n_bodies
+    az = [0.0] * n_bodies
+
+    start_time = time.time()
+
+    with ThreadPoolExecutor(max_workers=n_threads) as pool:
+        for _ in range(n_steps):
+            futures = [pool.submit(python_chunk, xs, ys, zs, ms, ax, ay, az, start, end) for start, end in ranges]
+            for fut in futures:
+                fut.result()
+
+            for i in range(n_bodies):
+                vxs[i] += ax[i] * dt
+                vys[i] += ay[i] * dt
+                vzs[i] += az[i] * dt
+                xs[i] += vxs[i] * dt
+                ys[i] += vys[i] * dt
+                zs[i] += vzs[i] * dt
+
+    end_time = time.time()
+    return end_time - start_time
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Thread-pool N-body benchmark")
+    parser.add_argument("--n", type=int, default=100, help="Number of bodies")
+    parser.add_argument("--steps", type=int, default=100, help="Number of steps")
+    parser.add_argument("--threads", type=int, default=None, help="Number of threads")
+    parser.add_argument("--chunks", type=int, default=None, help="Number of row blocks per step (default: one per thread)")
+    parser.add_argument("--kernel", choices=["numpy", "cython", "python"], default="numpy", help="Chunk kernel")
+    parser.add_argument("--scenario", default="uniform", help="Initial conditions (see scenarios.py; non-uniform ones need NumPy)")
+    adaptive.add_arguments(parser)
+    args = parser.parse_args()
+
+    print(f"Running Thread-pool N-body with N={args.n}, Steps={adaptive.steps_label(args)}, Threads={args.threads}, Kernel={args.kernel}, "
+          f"Scenario={args.scenario}, GIL={gil_enabled()}")
+    run = lambda steps: run_simulation(args.n, steps, n_threads=args.threads, kernel=args.kernel, n_chunks=args.chunks,
+                                       scenario=args.scenario)
+    if args.adaptive:
+        adaptive.run_cli(args, run)
+        raise SystemExit(0)
+    duration = run(args.steps)
+    print(f"Time: {duration:.4f} seconds")
+    print(f"RESULT: {duration}")
@@ -0,0 +1,227 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+# Auto-tuning of backend parameters (block sizes, tile sizes, thread/process
+# counts, chunk splits). The best configuration per backend and N is stored
+# in a cache file keyed on the CPU model string from get_system_info(), and
+# backends read it through resolve() whenever a parameter is not given
+# explicitly.
+#
+#   python src/python/tuning.py --backend taichi-soa mp --n 1000 5000
+#
+# The cache lives in results/tuning.json unless NBODY_TUNING_CACHE is set.
+#
+# Each configuration runs in a child process that is killed after --timeout
+# seconds, so one pathological configuration cannot stall the search.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+
+DEFAULT_CACHE = os.path.join(REPO_ROOT, "results", "tuning.json")
+
+# Seconds one configuration may run (per round) before it is dropped
+DEFAULT_CONFIG_TIMEOUT = 60.0
+
+_host = None
+
+def cache_path():
+    return os.environ.get("NBODY_TUNING_CACHE", DEFAULT_CACHE)
+
+def host_key():
+    global _host
+    if _host is None:
+        from system_info import get_processor
+        _host = get_processor()
+    return _host
+
+def load_cache(path=None):
+    path = path or cache_path()
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save_cache(cache, path=None):
+    path = path or cache_path()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(cache, f, indent=2)
+
+def lookup(backend, n_bodies, path=None):
+    """Tuned parameters for this host and backend at the tuned N closest to
+    n_bodies (on a log scale), or {} if nothing has been tuned."""
+    try:
+        entries = load_cache(path).get(host_key(), {}).get(backend, [])
+    except (OSError, ValueError, ImportError):
+        return {}
+    if not entries:
+        return {}
+    best = min(entries, key=lambda e: abs(math.log(e["n"]) - math.log(max(n_bodies, 1))))
+    return dict(best["params"])
+
+def resolve(backend, n_bodies, defaults, **explicit):
+    """Defaults, overridden by tuned values, overridden by explicit (non-None) arguments."""
+    params = dict(defaults)
+    params.update({k: v for k, v in lookup(backend, n_bodies).items() if k in defaults})
+    params.update({k: v for k, v in explicit.items() if v is not None})
+    return params
+
+def _thread_counts():
+    cpus = os.cpu_count() or 1
+    return sorted({max(1, cpus // 4), max(1, cpus // 2), cpus})
+
+def _chunk_counts():
+    cpus = os.cpu_count() or 1
+    return [cpus, 2 * cpus, 4 * cpus]
+
+def _run_cuda(kernel):
+    def run(n, steps, params):
+        import cuda_impl
+        return cuda_impl.run_simulation(n, steps, kernel=kernel, **params)
+    return run
+
+def _run_taichi(layout):
+    def run(n, steps, params):
+        import taichi_impl
+        return taichi_impl.run_simulation(n, steps, layout=layout, **params)
+    return run
+
+def _run_threads(kernel):
+    def run(n, steps, params):
+        import thread_impl
+        return thread_impl.run_simulation(n, steps, kernel=kernel, **params)
+    return run
+
+def _run_mp(n, steps, params):
+    import mp_impl
+    return mp_impl.run_simulation(n, steps, **params)
+
+def search_spaces():
+    # backend -> (runner(n, steps, params) -> seconds, {param: candidate values})
+    threads = _thread_counts()
+    # Taichi j-tiles: small tiles stay in cache but cost one kernel launch each
+    tiles = {"tile": [256, 1024, 4096], "block_dim": [32, 128, 512], "threads": threads}
+    return {
+        "cuda-global": (_run_cuda("global"), {"threadsperblock": [64, 128, 256, 512, 1024]}),
+        "cuda-tiled": (_run_cuda("tiled"), {"threadsperblock": [64, 128, 256, 512, 1024]}),
+        "mp": (_run_mp, {"n_processes": threads, "chunks_per_process": [1, 2, 4]}),
+        "taichi-vector": (_run_taichi("vector"), {"threads": threads}),
+        "taichi-soa": (_run_taichi("soa"), tiles),
+        "taichi-aos": (_run_taichi("aos"), tiles),
+        "threads-numpy": (_run_threads("numpy"), {"n_threads": threads, "n_chunks": _chunk_counts()}),
+        "threads-cython": (_run_threads("cython"), {"n_threads": threads, "n_chunks": _chunk_counts()}),
+    }
+
+def run_config(backend, n_bodies, steps, params, timeout=DEFAULT_CONFIG_TIMEOUT):
+    """Seconds for `steps` steps of one configuration, timed in a child
+    process (python tuning.py --run-config ...) that is killed after
+    `timeout` seconds (subprocess.TimeoutExpired)."""
+    cmd = [sys.executable, os.path.abspath(__file__), "--run-config", backend, str(n_bodies), str(steps), json.dumps(params)]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    for line in result.stdout.splitlines():
+        if line.startswith("RESULT:"):
+            return float(line.split(":", 1)[1])
+    errors = result.stderr.strip().splitlines()
+    raise RuntimeError(errors[-1] if errors else f"exit code {result.returncode}")
+
+def tune(backend, n_bodies, steps=20, keep=0.5, timeout=DEFAULT_CONFIG_TIMEOUT, log=print):
+    """Successive halving over the backend's parameter grid.
+
+    Every configuration is first timed on a short run; only the fastest
+    `keep` fraction survives to the next round, which runs twice as many
+    steps, until `steps` is reached or one configuration is left. Configs
+    that fail, run longer than `timeout` seconds or would (at their last
+    rate) are dropped; if a whole round is dropped, the previous round's
+    best is kept. Returns (params, seconds per step).
+    """
+    _, space = search_spaces()[backend]
+    keys = list(space)
+    candidates = [(None, dict(zip(keys, values))) for values in itertools.product(*(space[k] for k in keys))]
+
+    rounds = max(0, math.ceil(math.log(len(candidates), 1 / keep))) if len(candidates) > 1 else 0
+    round_steps = max(1, steps >> rounds)
+    best = None
+
+    while True:
+        timings = []
+        for last_per_step, params in candidates:
+            if last_per_step is not None and last_per_step * round_steps > timeout:
+                log(f"  {params}: skipped (predicted {last_per_step * round_steps:.1f}s > {timeout:g}s timeout)")
+                continue
+            try:
+                per_step = run_config(backend, n_bodies, round_steps, params, timeout) / round_steps
+            except subprocess.TimeoutExpired:
+                log(f"  {params}: timed out after {timeout:g}s ({round_steps} steps)")
+                continue
+            except Exception as e:
+                log(f"  {params}: failed ({e})")
+                continue
+            log(f"  {params}: {per_step * 1e3:.3f} ms/step ({round_steps} steps)")
+            timings.append((per_step, params))
+        if not timings:
+            if best is None:
+                raise RuntimeError(f"Every configuration failed for {backend}")
+            break
+
+        timings.sort(key=lambda t: t[0])
+        best = timings[0]
+        if len(timings) == 1 or round_steps >= steps:
+            break
+        candidates = timings[:max(1, math.ceil(len(timings) * keep))]
+        round_steps = min(steps, round_steps * 2)
+
+    per_step, params = best
+    return params, per_step
+
+def record(backend, n_bodies, steps, params, per_step, path=None):
+    cache = load_cache(path)
+    entries = cache.setdefault(host_key(), {}).setdefault(backend, [])
+    entries[:] = [e for e in entries if e["n"] != n_bodies]
+    entries.append({
+        "n": n_bodies,
+        "steps": steps,
+        "time_per_step": per_step,
+        "params": params,
+        "tuned_at": datetime.now(timezone.utc).isoformat(),
+    })
+    entries.sort(key=lambda e: e["n"])
+    save_cache(cache, path)
+
+if __name__ == "__main__":
+    spaces = search_spaces()
+    if len(sys.argv) == 6 and sys.argv[1] == "--run-config":
+        # Child process of run_config(): time one configuration
+        backend, n, steps, params = sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), json.loads(sys.argv[5])
+        print(f"RESULT: {spaces[backend][0](n, steps, params)}")
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Auto-tune N-body backend parameters for this machine")
+    parser.add_argument("--backend", nargs="+", choices=sorted(spaces), default=sorted(spaces), help="Backends to tune")
+    parser.add_argument("--n", type=int, nargs="+", default=[1000, 5000], help="N values to tune at (one entry per N range)")
+    parser.add_argument("--steps", type=int, default=20, help="Steps in the final round")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_CONFIG_TIMEOUT, help="Seconds one configuration may run before it is dropped")
+    args = parser.parse_args()
+
+    print(f"Tuning for {host_key()}")
+    for backend in args.backend:
+        for n in args.n:
+            print(f"{backend} (N={n})")
+            start = time.time()
+            try:
+                params, per_step = tune(backend, n, args.steps, timeout=args.timeout)
+            except (ImportError, RuntimeError) as e:
+                print(f"  Skipping {backend}: {e}")
+                break
+            record(backend, n, args.steps, params, per_step)
+            print(f"  best {params}: {per_step * 1e3:.3f} ms/step (tuned in {time.time() - start:.1f}s)")
+    print(f"Saved to {cache_path()}")
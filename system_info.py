@@ -0,0 +1,65 @@
+import platform
+import shutil
+import subprocess
+
+# Description of the machine a benchmark runs on, shared by bench_runner.py
+# (results files and store) and the backends (tuning cache keys). Standard
+# library only, and copied into every Docker image next to bench_runner.py.
+
+def get_gpu_info():
+    try:
+        # Check if nvidia-smi exists
+        if not shutil.which("nvidia-smi"):
+             return "No GPU detected (nvidia-smi not found)"
+        
+        result = subprocess.run(["nvidia-smi", "--query-gpu=name,memory.total", 
+                               "--format=csv,noheader"], capture_output=True, text=True)
+        return result.stdout.strip()
+    except Exception as e:
+        return f"GPU Check Failed: {str(e)}"
+
+def get_cuda_version():
+    try:
+        # Check if nvcc exists
+        if not shutil.which("nvcc"):
+            return "Unknown (nvcc not found)"
+
+        result = subprocess.run(["nvcc", "--version"], capture_output=True, text=True)
+        for line in result.stdout.splitlines():
+            if "release" in line:
+                return line.strip()
+        return "Unknown"
+    except:
+        return "Unknown"
+
+def get_processor():
+    processor = platform.processor()
+    if not processor:
+        try:
+            if platform.system() == "Linux":
+                with open("/proc/cpuinfo", "r") as f:
+                    for line in f:
+                        if "model name" in line:
+                            processor = line.split(":")[1].strip()
+                            break
+            elif platform.system() == "Windows":
+                import subprocess
+                result = subprocess.run(["wmic", "cpu", "get", "name"], capture_output=True, text=True)
+                lines = result.stdout.strip().split("\n")
+                if len(lines) > 1:
+                    processor = lines[1].strip()
+        except:
+            processor = "Unknown"
+    return processor or "Unknown"
+
+def get_system_info():
+    processor = get_processor()
+    
+    return {
+        "os": platform.system(),
+        "release": platform.release(),
+        "python": platform.python_version(),
+        "processor": processor,
+        "gpu": get_gpu_info(),
+        "cuda_version": get_cuda_version(),
+    }